@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Load-testing harness for the auth and dashboard endpoints
+Usage: python -m bench.run [options]
+
+By default main.app is booted in-process against local stand-ins:
+- SQLite file database (or --database-url for a local Postgres)
+- mongomock (or --mongo-url for a local mongod)
+- an in-process SMTP sink that accepts and discards every email
+
+Examples:
+- python -m bench.run --concurrency 50 --duration 30
+- python -m bench.run --mix login=1,me=4,dashboard=4 --out bench/results
+- python -m bench.run --url http://localhost:8000   (drive an already running server)
+- python -m bench.run --compare bench/results/<previous>.json
+
+Extra dependencies: pip install -r bench/requirements.txt
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+ENDPOINTS = {
+    "create-user": ("POST", "/api/auth/create-user"),
+    "login": ("POST", "/api/auth/login"),
+    "me": ("GET", "/api/auth/user/me"),
+    "profile-update": ("PATCH", "/api/auth/profile/update"),
+    "dashboard": ("GET", "/dashboard"),
+}
+DEFAULT_MIX = "create-user=1,login=2,me=5,profile-update=2,dashboard=5"
+BENCH_PASSWORD = "bench-password"
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def configure_environment(args, smtp_port):
+    """Point the app at the stand-ins; must run before anything imports the app"""
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        db_path = Path(tempfile.mkdtemp(prefix="aiyo-bench-")) / "bench.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ.update(
+        EMAIL_HOST="127.0.0.1",
+        EMAIL_PORT=str(smtp_port),
+        EMAIL_USER="bench",
+        EMAIL_PASSWORD="bench",
+        EMAIL_USE_SSL="0",
+        EMAIL_STARTTLS="0",
+    )
+
+
+def install_mongo_standin(args):
+    import db.mongo
+
+    if args.mongo_url:
+        return
+    from mongomock_motor import AsyncMongoMockClient
+
+    class BenchMongoClient(AsyncMongoMockClient):
+        async def close(self):
+            pass
+
+    db.mongo.mongo_client = BenchMongoClient()
+
+
+async def seed(args):
+    """Create verified users with profiles, plus --orders orders per user"""
+    from sqlalchemy import select
+    from db.models import AsyncSessionLocal, Profile, User
+    from db.mongo import get_orders_collection
+    from utils.hashing import hash_password
+
+    password_hash = await hash_password(BENCH_PASSWORD)
+    run_id = uuid.uuid4().hex[:8]
+    emails = [f"bench-{run_id}-{i}@example.com" for i in range(args.users)]
+
+    async with AsyncSessionLocal() as db:
+        db.add_all(User(email=email, password=password_hash, is_verified=True) for email in emails)
+        await db.commit()
+        users = (await db.execute(select(User.id, User.platform_id).where(User.email.in_(emails)))).all()
+        db.add_all(Profile(user_id=user.id, nickname=f"bench {user.id}") for user in users)
+        await db.commit()
+
+    orders = get_orders_collection()
+    batch = []
+    for user in users:
+        for i in range(args.orders):
+            batch.append({"client_id": user.platform_id, "total": round(random.uniform(5, 500), 2), "items": i % 7 + 1})
+            if len(batch) >= 5000:
+                await orders.insert_many(batch)
+                batch = []
+    if batch:
+        await orders.insert_many(batch)
+    return emails
+
+
+class VirtualUser:
+    def __init__(self, client, email, weights, stats):
+        self.client = client
+        self.email = email
+        self.names = list(weights)
+        self.weights = list(weights.values())
+        self.stats = stats
+
+    async def call(self, name):
+        method, path = ENDPOINTS[name]
+        kwargs = {}
+        if name == "create-user":
+            password = BENCH_PASSWORD
+            kwargs["json"] = {"email": f"new-{uuid.uuid4().hex}@example.com", "password": password, "confirm_password": password}
+        elif name == "login":
+            kwargs["json"] = {"email": self.email, "password": BENCH_PASSWORD}
+        elif name == "profile-update":
+            kwargs["json"] = {"nickname": f"n{random.randint(0, 9999)}", "personalization_questions": {"q1": random.choice("abcd")}}
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        self.stats[name].append((time.perf_counter() - started, status))
+
+    async def login(self, attempts=10):
+        """Establish the session, backing off when auth admission control pushes back"""
+        for _ in range(attempts):
+            response = await self.client.post(ENDPOINTS["login"][1], json={"email": self.email, "password": BENCH_PASSWORD})
+            if response.status_code not in (429, 503):
+                return
+            await asyncio.sleep(float(response.headers.get("retry-after", "1")))
+
+    async def run(self, deadline, requests_left):
+        await self.login()
+        while time.perf_counter() < deadline and requests_left[0] != 0:
+            requests_left[0] -= 1
+            name = random.choices(self.names, self.weights)[0]
+            await self.call(name)
+            if name == "create-user":
+                # signups switch the session to the new (unverified) user; log back in
+                await self.login()
+
+
+def summarize(stats, elapsed):
+    report = {}
+    for name, samples in sorted(stats.items()):
+        latencies = sorted(latency for latency, _ in samples)
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[str(status)] += 1
+        errors = sum(1 for _, status in samples if not (isinstance(status, int) and status < 400))
+        report[name] = {
+            "requests": len(samples),
+            "errors": errors,
+            "statuses": dict(statuses),
+            "rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    total = sum(entry["requests"] for entry in report.values())
+    report["_total"] = {
+        "requests": total,
+        "errors": sum(entry["errors"] for entry in report.values()),
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+    }
+    return report
+
+
+def print_report(report, previous=None):
+    print(f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, entry in report.items():
+        if name == "_total":
+            continue
+        line = (f"{name:<16}{entry['requests']:>10}{entry['errors']:>8}{entry['rps']:>10}"
+                f"{entry['p50_ms']:>10}{entry['p95_ms']:>10}{entry['p99_ms']:>10}")
+        if previous and name in previous:
+            before = previous[name]
+            line += f"   (req/s {entry['rps'] - before['rps']:+.1f}, p99 {entry['p99_ms'] - before['p99_ms']:+.1f} ms)"
+        print(line)
+    total = report["_total"]
+    print(f"{'total':<16}{total['requests']:>10}{total['errors']:>8}{total['rps']:>10}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+async def bench(args, weights):
+    import httpx
+
+    in_process = not args.url
+    if in_process:
+        install_mongo_standin(args)
+        import main
+        app = main.app
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        emails = await seed(args)
+    else:
+        if not args.emails:
+            raise SystemExit("--url needs seeded users: pass --emails with one verified account per line")
+        emails = Path(args.emails).read_text().split()
+
+    stats = defaultdict(list)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    clients = []
+    for i in range(args.concurrency):
+        if in_process:
+            transport = httpx.ASGITransport(app=app)
+            clients.append(httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60))
+        else:
+            clients.append(httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60))
+
+    requests_left = [args.requests if args.requests else -1]
+    started = time.perf_counter()
+    deadline = started + args.duration
+    try:
+        await asyncio.gather(*[
+            VirtualUser(client, emails[i % len(emails)], weights, stats).run(deadline, requests_left)
+            for i, client in enumerate(clients)
+        ])
+    finally:
+        elapsed = time.perf_counter() - started
+        for client in clients:
+            await client.aclose()
+        if in_process:
+            await lifespan.__aexit__(None, None, None)
+    return summarize(stats, elapsed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the auth and dashboard endpoints")
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual users running in parallel")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0: no limit)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted endpoint mix (default {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=50, help="Verified users to seed")
+    parser.add_argument("--orders", type=int, default=200, help="Orders to seed per user")
+    parser.add_argument("--database-url", help="Use this database instead of a throwaway SQLite file")
+    parser.add_argument("--mongo-url", help="Use this mongod instead of mongomock")
+    parser.add_argument("--url", help="Drive an already running server instead of booting main.app in-process")
+    parser.add_argument("--emails", help="With --url: file of verified accounts (password: bench-password)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for a reproducible request sequence")
+    parser.add_argument("--out", default="bench/results", help="Directory for the JSON results")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    random.seed(args.seed)
+
+    from bench.smtp_sink import SMTPSink
+    sink = SMTPSink().start()
+    configure_environment(args, sink.port)
+    try:
+        report, elapsed = asyncio.run(bench(args, weights))
+    finally:
+        sink.stop()
+
+    previous = json.loads(Path(args.compare).read_text())["results"] if args.compare else None
+    print_report(report, previous)
+    print(f"{sink.messages} emails delivered to the SMTP sink over {sink.sessions} sessions")
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_file = out_dir / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out_file.write_text(json.dumps({
+        "revision": git_revision(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "out")},
+        "elapsed_seconds": round(elapsed, 3),
+        "results": report,
+    }, indent=2))
+    print(f"Results saved to {out_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
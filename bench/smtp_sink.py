@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+
+class SMTPSink:
+    """
+    Minimal SMTP server that accepts any login and message and discards it.
+
+    Speaks just enough SMTP (EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT) for
+    smtplib and utils.email_sender's pool. Runs on its own thread and event loop so
+    blocking smtplib calls from the app's threadpool never wait on the bench loop.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.messages = 0
+        self.sessions = 0
+        self._writers = set()
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="smtp-sink", daemon=True)
+
+    async def _handle(self, reader, writer):
+        self.sessions += 1
+        self._writers.add(writer)
+        writer.write(b"220 bench-sink ESMTP\r\n")
+        in_data = False
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if in_data:
+                if line in (b".\r\n", b".\n"):
+                    in_data = False
+                    self.messages += 1
+                    writer.write(b"250 OK queued\r\n")
+                continue
+            command = line.strip().split(b" ", 1)[0].upper()
+            if command in (b"EHLO", b"HELO"):
+                writer.write(b"250-bench-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif command == b"AUTH":
+                writer.write(b"235 Authentication successful\r\n")
+            elif command == b"DATA":
+                in_data = True
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:  # MAIL, RCPT, RSET, NOOP
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        self._writers.discard(writer)
+        writer.close()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def drop_sessions(self):
+        """Close every open session from the server side, like a restart or network drop"""
+        done = threading.Event()
+
+        def drop():
+            for writer in list(self._writers):
+                writer.transport.abort()
+            self._writers.clear()
+            done.set()
+
+        self._loop.call_soon_threadsafe(drop)
+        done.wait()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
@@ -1,11 +1,150 @@
+import os
 from sqladmin import ModelView
+from sqladmin.pagination import Pagination, PageControl
+from sqlalchemy import asc, desc, text
+from sqlalchemy.orm import selectinload
 from db.models import User, Profile, VerificationOTP
+from utils.auth import invalidate_principal
 
-class UserAdmin(ModelView, model=User):
-   pass
+# Above this many rows (per Postgres statistics) list views show pg_class.reltuples instead of COUNT(*)
+ADMIN_EXACT_COUNT_THRESHOLD = int(os.getenv("ADMIN_EXACT_COUNT_THRESHOLD", "10000"))
 
-class ProfileAdmin(ModelView, model=Profile):
-   pass
 
-class VerificationOTPAdmin(ModelView, model=VerificationOTP):
-   pass
\ No newline at end of file
+class KeysetPagination(Pagination):
+   """
+   Page of a keyset-paginated list. Prev/next link to `?after=<pk>` /
+   `?before=<pk>` cursors instead of page offsets; the page number is only
+   carried along for display, and the count may be an estimate.
+   """
+
+   def __init__(self, rows, page, page_size, count, has_previous, has_next, pk_name):
+      super().__init__(rows=rows, page=page, page_size=page_size, count=count)
+      self._has_previous = has_previous
+      self._has_next = has_next
+      self.pk_name = pk_name
+
+   def __post_init__(self):
+      # no clamping: an estimated count must never redirect the user to another page
+      pass
+
+   @property
+   def has_previous(self):
+      return self._has_previous
+
+   @property
+   def has_next(self):
+      return self._has_next
+
+   def add_pagination_urls(self, base_url):
+      base_url = base_url.remove_query_params(["after", "before"])
+      if self.has_previous:
+         first = getattr(self.rows[0], self.pk_name)
+         self.page_controls.append(PageControl(number=1, url=str(base_url.include_query_params(page=1))))
+         if self.page > 2:
+            url = base_url.include_query_params(page=self.page - 1, before=first)
+            self.page_controls.append(PageControl(number=self.page - 1, url=str(url)))
+      if not self.has_previous:
+         # sqladmin's next_page/previous_page look up page +/- 1 among the controls
+         self.page = 1
+      self.page_controls.append(PageControl(number=self.page, url="#"))
+      if self.has_next and self.rows:
+         last = getattr(self.rows[-1], self.pk_name)
+         url = base_url.include_query_params(page=self.page + 1, after=last)
+         self.page_controls.append(PageControl(number=self.page + 1, url=str(url)))
+
+
+class KeysetModelView(ModelView):
+   """
+   ModelView listing by primary-key keyset (newest first) instead of OFFSET,
+   with estimated counts on large Postgres tables. Searching, filtering or
+   sorting by another column falls back to sqladmin's default pagination.
+   """
+
+   def _keyset_applicable(self, request):
+      params = request.query_params
+      if params.get("search") or any(params.get(f.parameter_name) for f in self.get_filters()):
+         return False
+      sort_by = params.get("sortBy")
+      return sort_by in (None, self.pk_columns[0].name) and len(self.pk_columns) == 1
+
+   async def count(self, request, stmt=None):
+      if stmt is None and self.session_maker.kw["bind"].dialect.name == "postgresql":
+         rows = await self._run_arbitrary_query(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)")
+            .bindparams(table=self.model.__tablename__)
+         )
+         if rows and rows[0][0] >= ADMIN_EXACT_COUNT_THRESHOLD:
+            return rows[0][0]
+      return await super().count(request, stmt)
+
+   async def list(self, request):
+      if not self._keyset_applicable(request):
+         return await super().list(request)
+
+      params = request.query_params
+      page = self.validate_page_number(params.get("page"), 1)
+      page_size = self.validate_page_number(params.get("pageSize"), 0)
+      page_size = min(page_size or self.page_size, max(self.page_size_options))
+      after, before = params.get("after"), params.get("before")
+      if page > 1 and not after and not before:
+         # hand-typed ?page=N (or a page size change): no cursor to seek from
+         return await super().list(request)
+
+      pk = self.pk_columns[0]
+      newest_first = params.get("sort", "desc" if params.get("sortBy") is None else "asc") == "desc"
+      forward_order, backward_order = (desc(pk), asc(pk)) if newest_first else (asc(pk), desc(pk))
+
+      base_stmt = self.list_query(request)
+      for relation in self._list_relations:
+         base_stmt = base_stmt.options(selectinload(relation))
+
+      async def fetch(after=None, before=None):
+         if before:
+            value = pk.type.python_type(before)
+            stmt = base_stmt.where(pk > value if newest_first else pk < value).order_by(backward_order)
+         else:
+            stmt = base_stmt
+            if after:
+               value = pk.type.python_type(after)
+               stmt = stmt.where(pk < value if newest_first else pk > value)
+            stmt = stmt.order_by(forward_order)
+         rows = list(await self._run_query(stmt.limit(page_size + 1)))
+         more = len(rows) > page_size
+         rows = rows[:page_size]
+         if before:
+            rows.reverse()
+            return rows, more, True
+         return rows, bool(after), more
+
+      try:
+         rows, has_previous, has_next = await fetch(after, before)
+      except ValueError:
+         return await super().list(request)
+      if (before and not has_previous) or (after and not rows):
+         # Paged back to the start, or a stale cursor after deletions: show the first page
+         page = 1
+         rows, has_previous, has_next = await fetch()
+
+      count = await self.count(request)
+      return KeysetPagination(rows, page, page_size, count, has_previous, has_next, pk.key)
+
+
+# Default list columns and sortable columns are all indexed (primary keys / unique / explicit indexes)
+class UserAdmin(KeysetModelView, model=User):
+   column_list = [User.id, User.email, User.platform_id, User.is_verified, User.is_active, User.is_admin, User.joined_at]
+   column_sortable_list = [User.id, User.email, User.platform_id]
+   column_searchable_list = [User.email]
+
+   async def after_model_change(self, data, model, is_created, request):
+      await invalidate_principal(model.id)
+
+   async def after_model_delete(self, model, request):
+      await invalidate_principal(model.id)
+
+class ProfileAdmin(KeysetModelView, model=Profile):
+   column_list = [Profile.id, Profile.user_id, Profile.nickname]
+   column_sortable_list = [Profile.id, Profile.user_id]
+
+class VerificationOTPAdmin(KeysetModelView, model=VerificationOTP):
+   column_list = [VerificationOTP.id, VerificationOTP.email, VerificationOTP.otp, VerificationOTP.is_used, VerificationOTP.created_at, VerificationOTP.expires_at]
+   column_sortable_list = [VerificationOTP.id, VerificationOTP.expires_at]
@@ -0,0 +1,112 @@
+import time
+from datetime import datetime
+from sqlalchemy import func, select
+from db.models import BackfillProgress, SessionLocal, User, generate_platform_id
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_SLEEP = 0.0
+
+
+class Backfill:
+    """
+    A data backfill: `apply(db, rows)` fixes one chunk of `model` rows matching `where`.
+
+    Rows are visited in primary-key order, `batch_size` at a time, one transaction
+    per chunk. The chunk's changes and the new resume point in backfill_progress
+    commit together, so a killed run picks up after the last committed chunk.
+    """
+
+    def __init__(self, name, model, where, apply, description=""):
+        self.name = name
+        self.model = model
+        self.where = where
+        self.apply = apply
+        self.description = description
+
+    @property
+    def pk(self):
+        return self.model.__mapper__.primary_key[0]
+
+    def remaining(self, db, last_pk):
+        return db.execute(
+            select(func.count()).select_from(self.model).where(self.where(), self.pk > last_pk)
+        ).scalar_one()
+
+    def chunk(self, db, last_pk, batch_size):
+        return db.execute(
+            select(self.model).where(self.where(), self.pk > last_pk).order_by(self.pk).limit(batch_size)
+        ).scalars().all()
+
+
+BACKFILLS = {}
+
+
+def register_backfill(name, model, where, description=""):
+    """Decorator registering `apply(db, rows)` as a backfill runnable from migrate.py"""
+    def decorator(apply):
+        BACKFILLS[name] = Backfill(name, model, where, apply, description or (apply.__doc__ or "").strip())
+        return apply
+    return decorator
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def run_backfill(name, batch_size=DEFAULT_BATCH_SIZE, sleep=DEFAULT_SLEEP, restart=False):
+    """Run (or resume) a registered backfill; returns the number of rows processed by this run"""
+    backfill = BACKFILLS[name]
+
+    with SessionLocal() as db:
+        progress = db.get(BackfillProgress, name)
+        if progress is None:
+            progress = BackfillProgress(name=name, last_pk=0, rows_done=0)
+            db.add(progress)
+        elif restart:
+            progress.last_pk, progress.rows_done, progress.started_at = 0, 0, datetime.now()
+        elif progress.last_pk:
+            print(f"Resuming {name} after {backfill.pk.key}={progress.last_pk} ({progress.rows_done} rows done)")
+        progress.finished_at = None
+        db.commit()
+
+        total = backfill.remaining(db, progress.last_pk)
+        print(f"{name}: {total} rows to process in chunks of {batch_size}")
+
+        processed = 0
+        started = time.perf_counter()
+        while True:
+            rows = backfill.chunk(db, progress.last_pk, batch_size)
+            if not rows:
+                break
+            backfill.apply(db, rows)
+            progress.last_pk = getattr(rows[-1], backfill.pk.key)
+            progress.rows_done += len(rows)
+            db.commit()
+            # drop the chunk's objects so memory stays bounded by batch_size
+            db.expunge_all()
+            progress = db.get(BackfillProgress, name)
+
+            processed += len(rows)
+            elapsed = time.perf_counter() - started
+            rate = processed / elapsed if elapsed else 0.0
+            eta = format_duration((total - processed) / rate) if rate and total > processed else "0m00s"
+            print(f"{name}: {processed}/{total} rows, {rate:.0f} rows/s, ETA {eta}")
+            if sleep:
+                time.sleep(sleep)
+
+        progress.finished_at = datetime.now()
+        db.commit()
+
+    elapsed = time.perf_counter() - started
+    print(f"{name}: done, {processed} rows in {format_duration(elapsed)}")
+    return processed
+
+
+@register_backfill("populate_platform_ids", User, lambda: User.platform_id.is_(None))
+def populate_platform_ids(db, users):
+    """Assign a platform_id to users created before the column existed"""
+    for user in users:
+        user.platform_id = generate_platform_id()
@@ -1,50 +1,150 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, JSON, ForeignKey, create_engine,Text,Date, UniqueConstraint, Table
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, JSON, ForeignKey, create_engine,Text,Date, UniqueConstraint, Table, Index, Sequence, DDL, event
 from sqlalchemy.orm import relationship, declarative_base, sessionmaker
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from datetime import datetime
-from passlib.context import CryptContext
 from dotenv import load_dotenv
+# Password hashing (bcrypt runs in a process pool, see utils/hashing.py)
+from utils.hashing import pwd_context, hash_password, verify_password
+from db.pool import TimedQueuePool, TimedAsyncAdaptedQueuePool
+from db.platform_ids import PLATFORM_ID_BLOCK_SIZE, PLATFORM_ID_SEQUENCE, PLATFORM_ID_SPACE, PlatformIdAllocator
 import os
-import random
 load_dotenv()
 
 DATABASE_URL= os.environ['DATABASE_URL']
 
-engine= create_engine(DATABASE_URL)
+# Async drivers for the sync URLs we already configure (psycopg2 / pysqlite)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+# libpq/psycopg2 query parameters asyncpg takes under another name
+ASYNCPG_RENAMED_PARAMS = {"sslmode": "ssl"}
+# Query parameters asyncpg.connect() accepts as URL strings (numeric ones would arrive as str)
+ASYNCPG_PARAMS = {"ssl", "target_session_attrs", "passfile", "krbsrvname", "gsslib", "prepared_statement_cache_size"}
+
+
+def async_database_url(url):
+    """
+    Return the async-driver equivalent of a sync database URL.
+
+    For asyncpg, `sslmode` becomes `ssl` (it takes the same values). Any other
+    libpq-only parameter (sslrootcert, connect_timeout, application_name, ...) would
+    fail on first connect, so those URLs need an explicit ASYNC_DATABASE_URL.
+    """
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    url = url.set(drivername=drivername)
+    if drivername == "postgresql+asyncpg":
+        query = {}
+        for key, value in url.query.items():
+            key = ASYNCPG_RENAMED_PARAMS.get(key, key)
+            if key not in ASYNCPG_PARAMS:
+                raise ValueError(
+                    f"DATABASE_URL parameter {key!r} cannot be passed on to asyncpg; "
+                    f"set ASYNC_DATABASE_URL for the async engine"
+                )
+            query[key] = value
+        url = url.set(query=query)
+    return url.render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+# Connection pool, per engine and per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+
+def pool_options(url, poolclass):
+    """create_engine pool kwargs; SQLite keeps SQLAlchemy's default pool"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# Sync engine: used by sqladmin, alembic and create_all
+engine= create_engine(DATABASE_URL, **pool_options(DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine: used by every API route so DB round-trips never block the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, TimedAsyncAdaptedQueuePool))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Feeds platform_ids (see db/platform_ids.py); declared here so create_all creates it on Postgres
+platform_id_seq = Sequence(
+    PLATFORM_ID_SEQUENCE,
+    start=1,
+    increment=PLATFORM_ID_BLOCK_SIZE,
+    # the last block [maxvalue, maxvalue + block) still ends within the permuted space
+    maxvalue=PLATFORM_ID_SPACE - PLATFORM_ID_BLOCK_SIZE,
+    metadata=Base.metadata,
+)
+platform_id_allocator = PlatformIdAllocator(engine, async_engine)
+
+# RFC 7396 JSON merge patch used by profile updates (db/repositories.py, migration e4a18c6f3b92):
+# objects merge recursively, null removes a key, anything else (including arrays) replaces the target.
+# Attached to the metadata so create_all creates it on Postgres; merge_patch mirrors it in Python.
+JSONB_MERGE_PATCH = """
+CREATE OR REPLACE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+AS $$
+DECLARE
+    item record;
+BEGIN
+    IF patch IS NULL OR jsonb_typeof(patch) <> 'object' THEN
+        RETURN patch;
+    END IF;
+    IF target IS NULL OR jsonb_typeof(target) <> 'object' THEN
+        target := '{}'::jsonb;
+    END IF;
+    FOR item IN SELECT key, value FROM jsonb_each(patch) LOOP
+        IF jsonb_typeof(item.value) = 'null' THEN
+            target := target - item.key;
+        ELSE
+            target := target || jsonb_build_object(item.key, jsonb_merge_patch(target -> item.key, item.value));
+        END IF;
+    END LOOP;
+    RETURN target;
+END;
+$$
+"""
+event.listen(Base.metadata, "after_create", DDL(JSONB_MERGE_PATCH).execute_if(dialect="postgresql"))
 
 
 def generate_platform_id():
-    """Return random 8–10 digit string"""
-    return str(random.randint(10**7, 10**10 - 1))
+    """Unique 10 digit string from the platform_id sequence (random 8–10 digits without one)"""
+    return platform_id_allocator.allocate_sync()
 
-"""
 
-def populate_platform_ids():
-    with SessionLocal() as db:  # context manager automatically closes session
-        users_without_pid = db.query(User).filter(User.platform_id == None).all()
-        print(f"Found {len(users_without_pid)} users without platform_id")
+async def allocate_platform_id():
+    """Async counterpart of generate_platform_id; normally served from a prefetched block"""
+    return await platform_id_allocator.allocate()
 
-        for user in users_without_pid:
-            new_id = generate_platform_id()
-            # optional uniqueness check:
-            while db.query(User).filter(User.platform_id == new_id).first():
-                new_id = generate_platform_id()
-            user.platform_id = new_id
 
-        db.commit()
-        print("Platform IDs assigned successfully!")
-"""
 class User(Base):
     __tablename__= 'users'
 
@@ -55,7 +155,7 @@ class User(Base):
     is_verified= Column(Boolean, default=False)
     is_active= Column(Boolean, default=True)
     is_admin= Column(Boolean, default=False)
-    platform_id = Column(String(10), unique=True, nullable=False, default=generate_platform_id)  # 👈
+    platform_id = Column(String(10), unique=True, nullable=False, default=generate_platform_id)
 
     # Relationship with Profile
     profile= relationship("Profile", uselist=False, back_populates="user", cascade="all, delete-orphan")
@@ -66,6 +166,12 @@ class User(Base):
     def set_password(self, password):
         self.password= pwd_context.hash(password)
 
+    async def averify_password(self, plain_password):
+        return await verify_password(plain_password, self.password)
+
+    async def aset_password(self, password):
+        self.password= await hash_password(password)
+
 
     
     def __repr__(self):
@@ -74,11 +180,15 @@ class User(Base):
 
 class Profile(Base):
     __tablename__= 'profiles'
+    __table_args__ = (
+        # answer lookups (@> containment, ? key exists) for segment queries; JSONB exists on Postgres only
+        Index('ix_profiles_personalization_questions', 'personalization_questions', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
 
     id= Column(Integer, primary_key=True)
     user_id= Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), unique=True, nullable=False)
     nickname= Column(String(255), nullable=True)
-    personalization_questions= Column(JSON, nullable=True)
+    personalization_questions= Column(JSON().with_variant(JSONB(), 'postgresql'), nullable=True)
 
 
     user= relationship("User", back_populates="profile")
@@ -88,6 +198,12 @@ class Profile(Base):
     
 class VerificationOTP(Base):
     __tablename__ = 'verification_otps'
+    __table_args__ = (
+        # "latest unused OTP for this email" is a single index probe
+        Index('ix_verification_otps_email_is_used_created_at', 'email', 'is_used', 'created_at'),
+        # expired rows are purged in batches
+        Index('ix_verification_otps_expires_at', 'expires_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     email = Column(String(255), nullable=False)
@@ -103,3 +219,43 @@ class VerificationOTP(Base):
     def mark_as_used(self):
         """Mark this OTP as used"""
         self.is_used = True
+
+
+class BackfillProgress(Base):
+    """Resume point of a data backfill (see db/backfill.py)"""
+    __tablename__ = 'backfill_progress'
+
+    name = Column(String(100), primary_key=True)
+    last_pk = Column(Integer, nullable=False, default=0)
+    rows_done = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"{self.name} (last_pk={self.last_pk}, rows_done={self.rows_done})"
+
+
+class EmailOutbox(Base):
+    """Email waiting for delivery; written in the same transaction as the change it reports (see db/outbox.py)"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # workers claim the oldest due pending rows
+        Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default='pending')  # pending | sent | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+    # OTP emails are pointless once the code has expired; NULL never expires
+    expires_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
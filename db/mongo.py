@@ -0,0 +1,46 @@
+from pymongo import AsyncMongoClient, ASCENDING
+from pymongo.errors import PyMongoError
+from utils.metrics import MongoCommandTimer
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+MONGO_URL = os.getenv("MONGO_URL")
+MONGO_DB = os.getenv("MONGO_DB", "aiyo")
+
+# The async client connects lazily on the first operation, so creating it at import is cheap
+mongo_client = AsyncMongoClient(MONGO_URL, event_listeners=[MongoCommandTimer()])
+
+
+def get_mongo_db():
+    return mongo_client[MONGO_DB]
+
+
+def get_orders_collection():
+    return get_mongo_db()["orders"]
+
+
+# Every dashboard query is `client_id == X` plus a range/sort on `_id`. The order's
+# creation time is the `_id` timestamp, so this one index also serves date ranges.
+ORDERS_INDEXES = [
+    ("client_id_1__id_1", [("client_id", ASCENDING), ("_id", ASCENDING)]),
+]
+
+
+async def ensure_indexes():
+    """Create any missing index the dashboard queries rely on"""
+    collection = get_orders_collection()
+    try:
+        existing = await collection.index_information()
+        existing_keys = [list(info["key"]) for info in existing.values()]
+        for name, keys in ORDERS_INDEXES:
+            if keys not in existing_keys:
+                await collection.create_index(keys, name=name)
+                print(f"Created index {name} on {collection.full_name}")
+    except PyMongoError as e:
+        print(f"Could not ensure Mongo indexes: {e}")
+
+
+async def close_mongo():
+    await mongo_client.close()
@@ -0,0 +1,66 @@
+"""
+Postgres LISTEN/NOTIFY between web workers.
+
+Every gunicorn worker keeps its own in-process caches; a worker that changes a
+row announces it with NOTIFY and every worker's listener drops its copy. Other
+databases (SQLite in development) have no NOTIFY, so there `pg_notify` is a
+no-op and `listen_forever` returns straight away.
+"""
+
+import asyncio
+import os
+import asyncpg
+from sqlalchemy import text
+from db.models import async_engine
+
+NOTIFY_SUPPORTED = async_engine.dialect.name == "postgresql"
+# Wait before reconnecting a dropped listener
+LISTEN_RETRY_INTERVAL = float(os.getenv("LISTEN_RETRY_INTERVAL", "5"))
+
+
+async def pg_notify(channel, payload):
+    """Send a notification; delivered to every listener (including this worker's)"""
+    if not NOTIFY_SUPPORTED:
+        return
+    async with async_engine.begin() as conn:
+        await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": str(payload)})
+
+
+def _listener_connect_args():
+    # The same arguments SQLAlchemy passes to asyncpg.connect for the async engine
+    _, options = async_engine.dialect.create_connect_args(async_engine.url)
+    options.pop("prepared_statement_cache_size", None)
+    return options
+
+
+async def listen_forever(channel, on_message, on_connected=None, on_disconnected=None):
+    """
+    Background task: call `on_message(payload)` for every notification on `channel`.
+
+    Runs on a dedicated connection outside the pool and reconnects when it drops.
+    Notifications sent while disconnected are lost, so `on_connected` runs after
+    every (re)connect and `on_disconnected` whenever the connection is gone.
+    """
+    if not NOTIFY_SUPPORTED:
+        return
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(**_listener_connect_args())
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: closed.set())
+            await conn.add_listener(channel, lambda _conn, _pid, _channel, payload: on_message(payload))
+            if on_connected:
+                on_connected()
+            await closed.wait()
+            print(f"LISTEN {channel}: connection lost, reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"LISTEN {channel} failed: {e}")
+        finally:
+            if on_disconnected:
+                on_disconnected()
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(LISTEN_RETRY_INTERVAL)
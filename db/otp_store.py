@@ -0,0 +1,154 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import delete, desc, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import AsyncSessionLocal, VerificationOTP
+
+load_dotenv()
+
+# "sql" keeps OTPs in verification_otps; "memory" keeps them in this process only, so it
+# needs a single worker process (WEB_CONCURRENCY=1): an OTP issued by one worker is
+# unknown to the others
+OTP_STORE = os.getenv("OTP_STORE", "sql")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+if OTP_STORE == "memory" and WEB_CONCURRENCY > 1:
+    raise RuntimeError(
+        f"OTP_STORE=memory is per-process and cannot run with WEB_CONCURRENCY={WEB_CONCURRENCY}; "
+        f"use OTP_STORE=sql or a single worker"
+    )
+OTP_PURGE_INTERVAL = float(os.getenv("OTP_PURGE_INTERVAL", "300"))
+OTP_PURGE_BATCH_SIZE = int(os.getenv("OTP_PURGE_BATCH_SIZE", "1000"))
+
+
+class OTPStore(ABC):
+    """
+    Storage for verification/password-reset OTPs.
+
+    Records behave like `VerificationOTP` (`otp`, `expires_at`, `is_valid()`).
+    Writes to the SQL store join the caller's session and are persisted by the
+    caller's commit, so an OTP and the change it authorises commit together.
+    """
+
+    @abstractmethod
+    async def issue(self, email, otp, expires_at):
+        ...
+
+    @abstractmethod
+    async def latest_unused(self, email):
+        ...
+
+    @abstractmethod
+    async def mark_used(self, record):
+        ...
+
+    @abstractmethod
+    async def purge(self):
+        """Delete expired and used OTPs; returns the number removed"""
+
+
+class SQLOTPStore(OTPStore):
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def issue(self, email, otp, expires_at):
+        record = VerificationOTP(email=email, otp=otp, expires_at=expires_at)
+        self.db.add(record)
+        return record
+
+    async def latest_unused(self, email):
+        result = await self.db.execute(
+            select(VerificationOTP).where(
+                VerificationOTP.email == email,
+                VerificationOTP.is_used == False
+            ).order_by(desc(VerificationOTP.created_at)).limit(1)
+        )
+        return result.scalars().first()
+
+    async def mark_used(self, record):
+        record.mark_as_used()
+
+    @staticmethod
+    async def purge(batch_size=OTP_PURGE_BATCH_SIZE):
+        """
+        Delete in batches so the purge never holds a long lock on the table, skipping
+        rows a concurrent request (or the other worker's purge) has locked
+        """
+        removed = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                ids = select(VerificationOTP.id).where(
+                    or_(VerificationOTP.expires_at < datetime.now(), VerificationOTP.is_used == True)
+                ).limit(batch_size).with_for_update(skip_locked=True)
+                result = await db.execute(
+                    delete(VerificationOTP)
+                    .where(VerificationOTP.id.in_(ids.scalar_subquery()))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            removed += result.rowcount
+            if result.rowcount < batch_size:
+                return removed
+
+
+class MemoryOTPStore(OTPStore):
+    """
+    Latest OTP per email in a dict; issuing a new OTP supersedes the previous one.
+    Single process only: every worker process has its own dict.
+    """
+
+    def __init__(self):
+        self._records = {}
+
+    async def issue(self, email, otp, expires_at):
+        record = VerificationOTP(email=email, otp=otp, expires_at=expires_at, created_at=datetime.now(), is_used=False)
+        self._records[email] = record
+        return record
+
+    async def latest_unused(self, email):
+        record = self._records.get(email)
+        if record is None or record.is_used:
+            return None
+        return record
+
+    async def mark_used(self, record):
+        record.mark_as_used()
+        if self._records.get(record.email) is record:
+            del self._records[record.email]
+
+    async def purge(self):
+        now = datetime.now()
+        stale = [email for email, record in self._records.items() if record.is_used or record.expires_at <= now]
+        for email in stale:
+            del self._records[email]
+        return len(stale)
+
+
+memory_otp_store = MemoryOTPStore()
+
+
+def get_otp_store(db: AsyncSession) -> OTPStore:
+    if OTP_STORE == "memory":
+        return memory_otp_store
+    return SQLOTPStore(db)
+
+
+async def purge_otps():
+    if OTP_STORE == "memory":
+        return await memory_otp_store.purge()
+    return await SQLOTPStore.purge()
+
+
+async def purge_otps_forever(interval=OTP_PURGE_INTERVAL):
+    """Background task: purge expired and used OTPs every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await purge_otps()
+            if removed:
+                print(f"Purged {removed} expired/used OTPs")
+        except Exception as e:
+            print(f"OTP purge failed: {e}")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Transactional email outbox
+Usage: python -m db.outbox [--once | --purge]
+
+Requests only add an EmailOutbox row to their session, so the email commits (or
+rolls back) together with the OTP it carries. Workers claim due rows in batches
+with FOR UPDATE SKIP LOCKED, deliver them over the SMTP pool and retry failures
+with exponential backoff. Any number of workers can run side by side.
+
+Bodies carry OTPs, so they are blanked as soon as a row is sent (or given up
+on, or its OTP expires before delivery), and finished rows are purged once they are older than the retention window.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import AsyncSessionLocal, EmailOutbox, async_engine
+from utils.email_sender import SMTP_POOL_SIZE, deliver_email
+
+load_dotenv()
+
+# Deliver from a background task in each web worker; set to 0 when running
+# dedicated `python -m db.outbox` processes instead
+EMAIL_OUTBOX_WORKER = os.getenv("EMAIL_OUTBOX_WORKER", "1") == "1"
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", "2"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+EMAIL_OUTBOX_BACKOFF = float(os.getenv("EMAIL_OUTBOX_BACKOFF", "30"))
+EMAIL_OUTBOX_MAX_BACKOFF = float(os.getenv("EMAIL_OUTBOX_MAX_BACKOFF", "3600"))
+# A claimed row is hidden from other workers this long; if its worker dies, it is retried after
+EMAIL_OUTBOX_LEASE = float(os.getenv("EMAIL_OUTBOX_LEASE", "300"))
+# Sent/failed rows are kept this long (3 days) for troubleshooting, then purged
+EMAIL_OUTBOX_RETENTION = float(os.getenv("EMAIL_OUTBOX_RETENTION", "259200"))
+EMAIL_OUTBOX_PURGE_INTERVAL = float(os.getenv("EMAIL_OUTBOX_PURGE_INTERVAL", "300"))
+EMAIL_OUTBOX_PURGE_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_PURGE_BATCH_SIZE", "1000"))
+
+# Wakes the in-process worker right after a request commits an email
+_wakeup = asyncio.Event()
+
+
+def enqueue_email(db: AsyncSession, to_email, subject, body, expires_at=None):
+    """
+    Add an email to the caller's session; it is sent once the caller commits.
+    Pass the OTP's `expires_at` so a code that expired while waiting is never delivered.
+    """
+    record = EmailOutbox(to_email=to_email, subject=subject, body=body, status="pending", attempts=0,
+                         next_attempt_at=datetime.now(), expires_at=expires_at)
+    db.add(record)
+    return record
+
+
+def notify_outbox():
+    """Call after committing enqueued emails so the in-process worker delivers them right away"""
+    _wakeup.set()
+
+
+def backoff(attempts):
+    """Exponential backoff with jitter before retry number `attempts`"""
+    delay = min(EMAIL_OUTBOX_MAX_BACKOFF, EMAIL_OUTBOX_BACKOFF * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+async def claim_batch(batch_size=EMAIL_OUTBOX_BATCH_SIZE):
+    """
+    Lease up to `batch_size` due emails in one statement.
+
+    The row locks are only held for the UPDATE: SKIP LOCKED lets concurrent workers
+    claim disjoint batches, and the pushed-back next_attempt_at keeps the rows away
+    from other workers while this one delivers them. Pending rows whose OTP has
+    expired are marked failed (and their bodies blanked) instead of being claimed.
+    """
+    now = datetime.now()
+    unexpired = or_(EmailOutbox.expires_at.is_(None), EmailOutbox.expires_at > now)
+    due = (
+        select(EmailOutbox.id)
+        .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now, unexpired)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    async with AsyncSessionLocal() as db:
+        expired = await db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.status == "pending", EmailOutbox.expires_at <= now)
+            .values(status="failed", last_error="OTP expired before delivery", body="")
+            .execution_options(synchronize_session=False)
+        )
+        if expired.rowcount:
+            print(f"Dropped {expired.rowcount} outbox emails whose OTP expired before delivery")
+        result = await db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(due.scalar_subquery()))
+            .values(attempts=EmailOutbox.attempts + 1, next_attempt_at=now + timedelta(seconds=EMAIL_OUTBOX_LEASE))
+            .returning(EmailOutbox.id, EmailOutbox.to_email, EmailOutbox.subject, EmailOutbox.body, EmailOutbox.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.all()
+        await db.commit()
+    return claimed
+
+
+async def _deliver(row, limit):
+    async with limit:
+        try:
+            await asyncio.to_thread(deliver_email, row.to_email, row.subject, row.body)
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+
+async def deliver_batch(batch_size=EMAIL_OUTBOX_BATCH_SIZE):
+    """Claim and deliver one batch; returns the number of emails claimed"""
+    claimed = await claim_batch(batch_size)
+    if not claimed:
+        return 0
+
+    # as many concurrent sends as the SMTP pool has connections
+    limit = asyncio.Semaphore(SMTP_POOL_SIZE)
+    errors = await asyncio.gather(*[_deliver(row, limit) for row in claimed])
+
+    now = datetime.now()
+    sent = [row.id for row, error in zip(claimed, errors) if error is None]
+    async with AsyncSessionLocal() as db:
+        if sent:
+            await db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(sent))
+                .values(status="sent", sent_at=now, last_error=None, body="")
+                .execution_options(synchronize_session=False)
+            )
+        for row, error in zip(claimed, errors):
+            if error is None:
+                continue
+            if row.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+                values = {"status": "failed", "last_error": error, "body": ""}
+                print(f"Giving up on email {row.id} to {row.to_email} after {row.attempts} attempts: {error}")
+            else:
+                values = {"next_attempt_at": now + backoff(row.attempts), "last_error": error}
+                print(f"Email {row.id} to {row.to_email} failed (attempt {row.attempts}), will retry: {error}")
+            await db.execute(
+                update(EmailOutbox).where(EmailOutbox.id == row.id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+    return len(claimed)
+
+
+async def purge_outbox(retention=EMAIL_OUTBOX_RETENTION, batch_size=EMAIL_OUTBOX_PURGE_BATCH_SIZE):
+    """Delete sent/failed rows older than `retention` seconds in batches; returns the number removed"""
+    cutoff = datetime.now() - timedelta(seconds=retention)
+    removed = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = select(EmailOutbox.id).where(
+                EmailOutbox.status.in_(["sent", "failed"]), EmailOutbox.created_at < cutoff
+            ).limit(batch_size).with_for_update(skip_locked=True)
+            result = await db.execute(
+                delete(EmailOutbox)
+                .where(EmailOutbox.id.in_(ids.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        removed += result.rowcount
+        if result.rowcount < batch_size:
+            return removed
+
+
+async def purge_outbox_forever(interval=EMAIL_OUTBOX_PURGE_INTERVAL):
+    """Background task: purge finished outbox rows every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await purge_outbox()
+            if removed:
+                print(f"Purged {removed} finished outbox emails")
+        except Exception as e:
+            print(f"Email outbox purge failed: {e}")
+
+
+async def run_outbox_worker(poll_interval=EMAIL_OUTBOX_POLL_INTERVAL, batch_size=EMAIL_OUTBOX_BATCH_SIZE):
+    """Deliver batches until the outbox is drained, then wait for a notify or the poll interval"""
+    while True:
+        _wakeup.clear()
+        try:
+            while await deliver_batch(batch_size) == batch_size:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Email outbox pass failed: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver emails from the outbox")
+    parser.add_argument("--once", action="store_true", help="Deliver everything currently due, then exit")
+    parser.add_argument("--batch-size", type=int, default=EMAIL_OUTBOX_BATCH_SIZE)
+    parser.add_argument("--purge", action="store_true", help="Delete finished rows past the retention window, then exit")
+    args = parser.parse_args()
+
+    if args.purge:
+        async def purge():
+            removed = await purge_outbox()
+            print(f"Purged {removed} finished outbox emails")
+            await async_engine.dispose()
+
+        asyncio.run(purge())
+        return 0
+
+    async def drain():
+        delivered = 0
+        while True:
+            count = await deliver_batch(args.batch_size)
+            delivered += count
+            if count < args.batch_size:
+                print(f"Processed {delivered} outbox emails")
+                await async_engine.dispose()
+                return
+
+    asyncio.run(drain() if args.once else run_outbox_worker(batch_size=args.batch_size))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import random
+import threading
+from collections import deque
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Keys the permutation. Never change it once ids have been issued: a different key
+# maps the same sequence values to different ids, which can collide with old ones.
+PLATFORM_ID_KEY = os.getenv("PLATFORM_ID_KEY", "platform-id").encode()
+
+PLATFORM_ID_SEQUENCE = "platform_id_seq"
+# Must match the sequence's INCREMENT BY (migration 3c1f9a7d2e64): one nextval reserves a block
+PLATFORM_ID_BLOCK_SIZE = 100
+# Ids are 10-digit strings: 1_000_000_000 + permute(n) for sequence values n < 9 * 10**9
+PLATFORM_ID_MIN = 10**9
+PLATFORM_ID_SPACE = 9 * 10**9
+
+# Balanced Feistel network over 34 bits (2**34 > PLATFORM_ID_SPACE), cycle-walked into the space
+HALF_BITS = 17
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+_round_key = hmac.new(PLATFORM_ID_KEY, digestmod=hashlib.sha256)
+
+
+def random_platform_id():
+    """Return random 8–10 digit string (legacy ids; used where there is no sequence)"""
+    return str(random.randint(10**7, 10**10 - 1))
+
+
+def _round(i, value):
+    mac = _round_key.copy()
+    mac.update(bytes((i,)) + value.to_bytes(3, "big"))
+    return int.from_bytes(mac.digest()[:3], "big") & HALF_MASK
+
+
+def _feistel(value):
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for i in range(ROUNDS):
+        left, right = right, left ^ _round(i, right)
+    return (left << HALF_BITS) | right
+
+
+def permute(n):
+    """Keyed bijection of [0, PLATFORM_ID_SPACE) onto itself"""
+    if not 0 <= n < PLATFORM_ID_SPACE:
+        raise ValueError(f"platform id sequence value out of range: {n}")
+    value = _feistel(n)
+    # Cycle walking: the Feistel network permutes 2**34 values, re-apply until back in range
+    while value >= PLATFORM_ID_SPACE:
+        value = _feistel(value)
+    return value
+
+
+def platform_id_for(n):
+    """Platform id for sequence value n: unique per n, no lookup needed"""
+    return str(PLATFORM_ID_MIN + permute(n))
+
+
+class PlatformIdAllocator:
+    """
+    Hands out platform_ids from blocks of `platform_id_seq` reserved ahead of time.
+
+    Each nextval reserves PLATFORM_ID_BLOCK_SIZE sequence values for this process,
+    and the next block is prefetched in the background once the current one runs
+    low (a task for async callers, a thread for sync ones), so signups normally
+    get their id without touching the database.
+    Databases without sequences (SQLite in development) get legacy random ids.
+    """
+
+    def __init__(self, engine, async_engine, block_size=PLATFORM_ID_BLOCK_SIZE):
+        self.engine = engine
+        self.async_engine = async_engine
+        self.block_size = block_size
+        self.low_water = max(1, block_size // 4)
+        self._blocks = deque()  # [next, end) sequence ranges
+        self._lock = threading.Lock()
+        self._prefetch_task = None
+        self._refill_thread = None
+        self._refill_error = None
+
+    @staticmethod
+    def uses_sequence(engine):
+        return engine.dialect.name == "postgresql"
+
+    def remaining(self):
+        with self._lock:
+            return sum(end - start for start, end in self._blocks)
+
+    def _take(self):
+        with self._lock:
+            if not self._blocks:
+                return None
+            start, end = self._blocks[0]
+            if start + 1 < end:
+                self._blocks[0] = (start + 1, end)
+            else:
+                self._blocks.popleft()
+            return start
+
+    def _add_block(self, start):
+        with self._lock:
+            self._blocks.append((start, start + self.block_size))
+
+    @staticmethod
+    def _nextval_statement():
+        return text(f"SELECT nextval('{PLATFORM_ID_SEQUENCE}')")
+
+    async def _fetch_block(self):
+        async with self.async_engine.connect() as conn:
+            start = (await conn.execute(self._nextval_statement())).scalar_one()
+        self._add_block(start)
+
+    def _prefetch(self):
+        if self._prefetch_task is None or self._prefetch_task.done():
+            self._prefetch_task = asyncio.ensure_future(self._fetch_block())
+            self._prefetch_task.add_done_callback(self._prefetch_done)
+        return self._prefetch_task
+
+    @staticmethod
+    def _prefetch_done(task):
+        # background prefetches are not awaited; the next allocate() simply retries
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Failed to reserve platform_id block: {task.exception()}")
+
+    async def prefetch(self):
+        """Reserve a block up front (startup), so the first signups don't wait for one"""
+        if self.uses_sequence(self.async_engine) and self.remaining() < self.low_water:
+            await asyncio.shield(self._prefetch())
+
+    async def allocate(self):
+        if not self.uses_sequence(self.async_engine):
+            return random_platform_id()
+        n = self._take()
+        while n is None:
+            await asyncio.shield(self._prefetch())
+            n = self._take()
+        if self.remaining() < self.low_water:
+            self._prefetch()
+        return platform_id_for(n)
+
+    def _fetch_block_sync(self):
+        try:
+            with self.engine.connect() as conn:
+                start = conn.execute(self._nextval_statement()).scalar_one()
+            self._refill_error = None
+            self._add_block(start)
+        except Exception as e:
+            self._refill_error = e
+            print(f"Failed to reserve platform_id block: {e}")
+
+    def _refill_sync(self):
+        with self._lock:
+            if self._refill_thread is None or not self._refill_thread.is_alive():
+                self._refill_thread = threading.Thread(
+                    target=self._fetch_block_sync, name="platform-id-prefetch", daemon=True
+                )
+                self._refill_thread.start()
+            return self._refill_thread
+
+    def allocate_sync(self):
+        """For sync sessions (admin, scripts): refills from a background thread"""
+        if not self.uses_sequence(self.engine):
+            return random_platform_id()
+        n = self._take()
+        while n is None:
+            # only when the prefetch fell behind (or at the very first allocation)
+            self._refill_sync().join()
+            n = self._take()
+            if n is None and self._refill_error is not None:
+                raise self._refill_error
+        if self.remaining() < self.low_water:
+            self._refill_sync()
+        return platform_id_for(n)
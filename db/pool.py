@@ -0,0 +1,71 @@
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolTelemetry:
+    """Counters for connection checkouts; read through `pool_stats`"""
+    __slots__ = ("checkouts", "timeouts", "wait_total", "wait_max", "observers")
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.observers = []  # callables taking the wait in seconds (e.g. a histogram's observe)
+
+    def record(self, waited):
+        self.checkouts += 1
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        for observer in self.observers:
+            observer(waited)
+
+
+class _TimedCheckoutMixin:
+    """Times every checkout: queue wait, plus connect/pre-ping when a connection is (re)opened"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.telemetry.timeouts += 1
+            raise
+        finally:
+            self.telemetry.record(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(engine):
+    """Gauges for an engine's pool (works for sync engines and AsyncEngine.sync_engine)"""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+        )
+    telemetry = getattr(pool, "telemetry", None)
+    if telemetry is not None:
+        stats.update(
+            checkouts=telemetry.checkouts,
+            checkout_timeouts=telemetry.timeouts,
+            checkout_wait_avg_ms=round(telemetry.wait_total / telemetry.checkouts * 1000, 3) if telemetry.checkouts else 0.0,
+            checkout_wait_max_ms=round(telemetry.wait_max * 1000, 3),
+        )
+    return stats
@@ -0,0 +1,99 @@
+"""
+Read models for the hot auth endpoints: each function is exactly one SELECT
+returning only the columns its endpoint needs.
+
+Statements per request:
+- POST /api/auth/login: 1 (get_login_row); it also warms the principal cache
+- GET /api/auth/user/me: 1 (get_profile_row) while the principal is cached,
+  plus 1 for get_current_user on a principal cache miss
+- PATCH /api/auth/profile/update: 1 (update_profile_row) on Postgres
+"""
+
+from sqlalchemy import cast, func, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import Profile, User
+
+
+async def get_login_row(db: AsyncSession, email):
+    """User credentials + principal fields + profile nickname, in one LEFT JOIN"""
+    result = await db.execute(
+        select(
+            User.id,
+            User.email,
+            User.password,
+            User.platform_id,
+            User.is_verified,
+            User.is_active,
+            User.is_admin,
+            User.joined_at,
+            Profile.nickname,
+        )
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .where(User.email == email)
+    )
+    return result.first()
+
+
+async def get_profile_row(db: AsyncSession, user_id):
+    """The profile columns /user/me returns"""
+    result = await db.execute(
+        select(Profile.id, Profile.nickname, Profile.personalization_questions)
+        .where(Profile.user_id == user_id)
+    )
+    return result.first()
+
+
+# Sentinel for "leave personalization_questions alone" (None means set it to NULL)
+UNCHANGED = object()
+
+
+def merge_patch(target, patch):
+    """RFC 7396 JSON merge patch, mirroring the jsonb_merge_patch SQL function"""
+    if not isinstance(patch, dict):
+        return patch
+    merged = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = merge_patch(merged.get(key), value)
+    return merged
+
+
+async def update_profile_row(db: AsyncSession, user_id, nickname=None, questions_patch=UNCHANGED):
+    """
+    Apply a profile update and return the updated (id, nickname, personalization_questions).
+
+    On Postgres the merge patch runs inside the UPDATE (jsonb_merge_patch), so the
+    change and the new values are one UPDATE ... RETURNING, and concurrent patches
+    touching different keys each apply to the latest row version. Elsewhere the
+    row is read, merged in Python and written back.
+    """
+    values = {}
+    if nickname is not None:
+        values["nickname"] = nickname
+
+    if questions_patch is not UNCHANGED:
+        if questions_patch is None:
+            values["personalization_questions"] = None
+        elif db.bind.dialect.name == "postgresql":
+            values["personalization_questions"] = func.jsonb_merge_patch(
+                Profile.personalization_questions, cast(questions_patch, JSONB)
+            )
+        else:
+            current = (await db.execute(
+                select(Profile.personalization_questions).where(Profile.user_id == user_id).with_for_update()
+            )).scalar_one_or_none()
+            values["personalization_questions"] = merge_patch(current, questions_patch)
+
+    if not values:
+        return await get_profile_row(db, user_id)
+
+    result = await db.execute(
+        update(Profile)
+        .where(Profile.user_id == user_id)
+        .values(**values)
+        .returning(Profile.id, Profile.nickname, Profile.personalization_questions)
+    )
+    return result.first()
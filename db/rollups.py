@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Per-client order rollups for /dashboard/summary
+Usage: python -m db.rollups [command]
+
+Available commands:
+- worker: Tail new orders by _id and fold them into the rollups (runs forever)
+- catch-up: Process every pending order once, then exit
+- rebuild: Recompute all rollups from scratch (stop the workers first)
+
+One document per client in `order_rollups`:
+    {_id: client_id, count, total, days: {"YYYY-MM-DD": {count, total}}, last_id, updated_at}
+Day buckets come from the order's _id timestamp (UTC).
+
+The checkpoint in `rollup_state` doubles as a lease: only the worker holding it
+reads orders and advances the checkpoint, so any number of workers (one per web
+process with ROLLUP_WORKER=1, or CLI workers) can run; the others stand by and
+take over once the holder stops renewing it.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from dotenv import load_dotenv
+from db.mongo import get_mongo_db, get_orders_collection
+
+load_dotenv()
+
+ROLLUPS_COLLECTION = "order_rollups"
+ROLLUP_STATE_COLLECTION = "rollup_state"
+ROLLUP_BATCH_SIZE = int(os.getenv("ROLLUP_BATCH_SIZE", "5000"))
+ROLLUP_POLL_INTERVAL = float(os.getenv("ROLLUP_POLL_INTERVAL", "2"))
+# Orders younger than this are left for the next pass: _ids are generated client-side,
+# so an insert may land slightly behind the newest _id already processed
+ROLLUP_LAG = float(os.getenv("ROLLUP_LAG", "5"))
+# Run the worker inside every web process; the lease keeps it to one writer at a time
+ROLLUP_WORKER = os.getenv("ROLLUP_WORKER", "0") == "1"
+# Renewed before every batch, so it must comfortably exceed the time one batch takes;
+# a crashed holder's lease is taken over after this long
+ROLLUP_LEASE = float(os.getenv("ROLLUP_LEASE", "60"))
+ORDER_TOTAL_FIELD = os.getenv("ORDER_TOTAL_FIELD", "total")
+
+DUPLICATE_KEY = 11000
+
+# Identifies this process as lease owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def get_rollups_collection(name=ROLLUPS_COLLECTION):
+    return get_mongo_db()[name]
+
+
+def get_state_collection():
+    return get_mongo_db()[ROLLUP_STATE_COLLECTION]
+
+
+def order_day(object_id):
+    return object_id.generation_time.strftime("%Y-%m-%d")
+
+
+def order_total(doc):
+    value = doc.get(ORDER_TOTAL_FIELD)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return 0
+    return value
+
+
+def rollup_updates(orders):
+    """
+    One upsert per client for a batch of orders (sorted by _id).
+
+    Each update only matches while the rollup's last_id is older than the batch's
+    first order for that client, so re-running the same batch after a crash is a
+    no-op for the clients already applied: the filter misses, the upsert hits the
+    existing _id and is reported as a duplicate key, which apply_orders ignores.
+    That only holds for exactly the same batch, see process_batch.
+    """
+    groups = {}
+    for doc in orders:
+        client_id = doc.get("client_id")
+        if client_id is None:
+            continue
+        group = groups.get(client_id)
+        if group is None:
+            group = groups[client_id] = {"first_id": doc["_id"], "inc": {"count": 0, "total": 0}}
+        group["last_id"] = doc["_id"]
+        total = order_total(doc)
+        day = order_day(doc["_id"])
+        inc = group["inc"]
+        inc["count"] += 1
+        inc["total"] += total
+        inc[f"days.{day}.count"] = inc.get(f"days.{day}.count", 0) + 1
+        inc[f"days.{day}.total"] = inc.get(f"days.{day}.total", 0) + total
+
+    now = datetime.now(timezone.utc)
+    return [
+        UpdateOne(
+            {"_id": client_id, "$or": [{"last_id": {"$lt": group["first_id"]}}, {"last_id": {"$exists": False}}]},
+            {"$inc": group["inc"], "$set": {"last_id": group["last_id"], "updated_at": now}},
+            upsert=True,
+        )
+        for client_id, group in groups.items()
+    ]
+
+
+async def apply_orders(orders, rollups):
+    updates = rollup_updates(orders)
+    if not updates:
+        return
+    try:
+        await rollups.bulk_write(updates, ordered=False)
+    except BulkWriteError as e:
+        errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+        if errors:
+            raise
+
+
+class LeaseLost(Exception):
+    """Another worker took over the rollup lease in the middle of a batch"""
+
+
+async def acquire_lease(rollups_name=ROLLUPS_COLLECTION, owner=WORKER_ID):
+    """
+    Take or renew the lease on `rollups_name`; returns its state document, or None
+    while another worker holds it.
+
+    The filter only matches a free, expired or already owned lease. When it misses
+    because someone else holds it, the upsert collides with the existing _id.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        return await get_state_collection().find_one_and_update(
+            {"_id": rollups_name, "$or": [
+                {"owner": owner}, {"owner": {"$exists": False}}, {"expires_at": {"$lt": now}},
+            ]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ROLLUP_LEASE)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return None
+
+
+async def release_lease(rollups_name=ROLLUPS_COLLECTION, owner=WORKER_ID):
+    await get_state_collection().update_one(
+        {"_id": rollups_name, "owner": owner}, {"$unset": {"owner": "", "expires_at": ""}}
+    )
+
+
+async def process_batch(rollups_name=ROLLUPS_COLLECTION, batch_size=ROLLUP_BATCH_SIZE, owner=WORKER_ID):
+    """
+    Fold the next batch of orders after the checkpoint; returns how many were read,
+    or None when another worker holds the lease.
+    """
+    checkpoint = await acquire_lease(rollups_name, owner)
+    if checkpoint is None:
+        return None
+
+    # A batch that was interrupted between apply_orders and the checkpoint is replayed
+    # over exactly the same range: a longer one would fold orders that arrived since
+    # into client groups whose update the rollup filter now skips.
+    pending_end = checkpoint.get("pending_end")
+    if pending_end is not None:
+        id_range = {"$lte": pending_end}
+    else:
+        id_range = {"$lt": ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=ROLLUP_LAG))}
+    if checkpoint.get("last_id"):
+        id_range["$gt"] = checkpoint["last_id"]
+
+    cursor = get_orders_collection().find(
+        {"_id": id_range}, projection={"client_id": 1, ORDER_TOTAL_FIELD: 1}
+    ).sort("_id", 1)
+    if pending_end is None:
+        cursor = cursor.limit(batch_size)
+    orders = await cursor.to_list()
+    if not orders:
+        if pending_end is not None:
+            await _update_checkpoint(rollups_name, owner, {"$set": {"last_id": pending_end}, "$unset": {"pending_end": ""}})
+        return 0
+
+    if pending_end is None:
+        # Record the batch's end before touching the rollups
+        await _update_checkpoint(rollups_name, owner, {"$set": {"pending_end": orders[-1]["_id"]}})
+    await apply_orders(orders, get_rollups_collection(rollups_name))
+    await _update_checkpoint(rollups_name, owner, {"$set": {"last_id": orders[-1]["_id"]}, "$unset": {"pending_end": ""}})
+    return len(orders)
+
+
+async def _update_checkpoint(rollups_name, owner, update):
+    """Only the lease holder may move the checkpoint"""
+    result = await get_state_collection().update_one({"_id": rollups_name, "owner": owner}, update)
+    if result.matched_count == 0:
+        raise LeaseLost(f"{rollups_name}: lease lost before the checkpoint could advance; "
+                        f"raise ROLLUP_LEASE above the time a batch takes")
+
+
+async def catch_up(rollups_name=ROLLUPS_COLLECTION, batch_size=ROLLUP_BATCH_SIZE, report=False):
+    processed = 0
+    while True:
+        count = await process_batch(rollups_name, batch_size)
+        if count is None:
+            if report:
+                print(f"{rollups_name}: another worker holds the lease")
+            return processed
+        processed += count
+        if report and count:
+            print(f"{rollups_name}: {processed} orders processed")
+        if count < batch_size:
+            return processed
+
+
+async def run_rollup_worker(poll_interval=ROLLUP_POLL_INTERVAL):
+    """Keeps the lease between passes (renewed every batch); standby workers retry each poll"""
+    try:
+        while True:
+            try:
+                await catch_up()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Order rollup pass failed: {e}")
+            await asyncio.sleep(poll_interval)
+    finally:
+        try:
+            await release_lease()
+        except Exception as e:
+            print(f"Could not release the order rollup lease: {e}")
+
+
+async def rebuild(batch_size=ROLLUP_BATCH_SIZE):
+    """Recompute into a scratch collection, then swap it in with its checkpoint"""
+    scratch = ROLLUPS_COLLECTION + "_rebuild"
+    state = get_state_collection()
+    await get_mongo_db().drop_collection(scratch)
+    await state.delete_one({"_id": scratch})
+
+    processed = await catch_up(scratch, batch_size, report=True)
+    checkpoint = await state.find_one({"_id": scratch})
+    if checkpoint and not checkpoint.get("last_id"):
+        checkpoint = None
+
+    if processed:
+        await get_rollups_collection(scratch).rename(ROLLUPS_COLLECTION, dropTarget=True)
+    else:
+        await get_mongo_db().drop_collection(ROLLUPS_COLLECTION)
+    # $set/$unset rather than replace, so a worker's lease on the live rollups survives
+    if checkpoint:
+        await state.update_one({"_id": ROLLUPS_COLLECTION},
+                               {"$set": {"last_id": checkpoint["last_id"]}, "$unset": {"pending_end": ""}}, upsert=True)
+    else:
+        await state.update_one({"_id": ROLLUPS_COLLECTION}, {"$unset": {"last_id": "", "pending_end": ""}})
+    await state.delete_one({"_id": scratch})
+    print(f"Rebuilt {ROLLUPS_COLLECTION} from {processed} orders")
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-client order rollups")
+    parser.add_argument("command", choices=["worker", "catch-up", "rebuild"])
+    parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        asyncio.run(run_rollup_worker())
+    elif args.command == "catch-up":
+        async def run_catch_up():
+            try:
+                return await catch_up(batch_size=args.batch_size, report=True)
+            finally:
+                await release_lease()
+
+        processed = asyncio.run(run_catch_up())
+        print(f"Caught up: {processed} orders processed")
+    else:
+        asyncio.run(rebuild(args.batch_size))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+from pathlib import Path
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from db.models import Base, engine
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def alembic_heads():
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "migrations"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+def schema_at_head(bind=engine):
+    """True when the database is stamped with the current Alembic head(s)"""
+    with bind.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current == alembic_heads()
+
+
+def ensure_schema(fast_start=False):
+    """
+    Create missing tables; returns True if create_all ran.
+
+    With `fast_start` the (comparatively slow) create_all is skipped when the
+    database is already at the Alembic head.
+    """
+    if fast_start and schema_at_head():
+        return False
+    Base.metadata.create_all(bind=engine)
+    return True
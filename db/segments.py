@@ -0,0 +1,80 @@
+import re
+from fastapi import HTTPException, status
+from sqlalchemy import and_, func, or_, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import Profile, User
+
+QUESTION_KEY_RE = re.compile(r"^[A-Za-z0-9_.\-]{1,100}$")
+MAX_VALUES_PER_QUESTION = 100
+
+
+def _check_key(key):
+    if not QUESTION_KEY_RE.match(key):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid question key: {key!r}")
+
+
+def _generic_equals(key, value):
+    """json_extract comparison for databases without JSONB (SQLite in development)"""
+    answer = Profile.personalization_questions[key]
+    if isinstance(value, bool):
+        return answer.as_boolean() == value
+    if isinstance(value, (int, float)):
+        return answer.as_float() == value
+    return answer.as_string() == value
+
+
+def segment_filter(query, dialect_name):
+    """
+    WHERE clause for a SegmentQuery.
+
+    On Postgres every predicate is a JSONB containment (`@>`) or key-exists (`?`)
+    test, both served by the GIN index on personalization_questions.
+    """
+    jsonb = dialect_name == "postgresql"
+    answers = type_coerce(Profile.personalization_questions, JSONB) if jsonb else None
+    clauses = []
+
+    for key, expected in query.answers.items():
+        _check_key(key)
+        values = expected if isinstance(expected, list) else [expected]
+        if not values or len(values) > MAX_VALUES_PER_QUESTION:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Question {key!r} needs between 1 and {MAX_VALUES_PER_QUESTION} values",
+            )
+        if jsonb:
+            clauses.append(or_(*[answers.contains({key: value}) for value in values]))
+        else:
+            clauses.append(or_(*[_generic_equals(key, value) for value in values]))
+
+    for key in query.answered:
+        _check_key(key)
+        if jsonb:
+            clauses.append(answers.has_key(key))
+        else:
+            clauses.append(func.json_type(Profile.personalization_questions, f'$."{key}"').is_not(None))
+
+    return and_(*clauses) if clauses else Profile.personalization_questions.is_not(None)
+
+
+async def count_segment(db: AsyncSession, query):
+    condition = segment_filter(query, db.bind.dialect.name)
+    return (await db.execute(select(func.count()).select_from(Profile).where(condition))).scalar_one()
+
+
+async def list_segment(db: AsyncSession, query, after=None, limit=100):
+    """One page of matching users, keyset-paginated on profiles.user_id"""
+    condition = segment_filter(query, db.bind.dialect.name)
+    stmt = (
+        select(User.id, User.email, User.platform_id, Profile.nickname)
+        .join(Profile, Profile.user_id == User.id)
+        .where(condition)
+        .order_by(Profile.user_id)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        stmt = stmt.where(Profile.user_id > after)
+    rows = (await db.execute(stmt)).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,22 @@
+# Loaded automatically by gunicorn from the working directory.
+#
+# For /metrics to aggregate every worker, point PROMETHEUS_MULTIPROC_DIR at an
+# empty directory that is wiped before gunicorn starts.
+import os
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+
+
+def on_starting(server):
+    # The in-memory OTP store is per-process: with several workers an OTP issued by
+    # one worker fails verification on the others
+    if os.getenv("OTP_STORE", "sql") == "memory" and server.cfg.workers > 1:
+        raise SystemExit(f"OTP_STORE=memory needs a single worker, got {server.cfg.workers}; use OTP_STORE=sql")
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
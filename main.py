@@ -1,17 +1,73 @@
+import time
+_boot_started = time.perf_counter()
+
 from fastapi import FastAPI
-from routers import users, home
-from db.models import Base,engine
-from utils.auth import SECRET_KEY
+from routers import users, home, internal
+from db.models import engine,async_engine, platform_id_allocator
+from utils.auth import SECRET_KEY, listen_for_principal_invalidations
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from fastapi.staticfiles import StaticFiles
+from utils.static_files import CachedStaticFiles, serve_admin_statics
+from utils.metrics import MetricsMiddleware, instrument_engine, metrics_endpoint
+from utils.sql_profiler import SQL_PROFILER, SQLProfilerMiddleware, install_sql_profiler
 from pathlib import Path
 import os
-import sqladmin
-import shutil
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-
-app = FastAPI()
+from contextlib import asynccontextmanager
+from utils.hashing import HashingOverloaded, shutdown_hash_pool
+from fastapi.responses import JSONResponse
+from utils.responses import ORJSONResponse
+from utils.email_sender import close_smtp_pool
+from db.mongo import close_mongo, ensure_indexes
+from db.otp_store import purge_otps_forever
+from db.rollups import ROLLUP_WORKER, run_rollup_worker
+from db.outbox import EMAIL_OUTBOX_WORKER, purge_outbox_forever, run_outbox_worker
+from db.schema import ensure_schema
+from utils.assets import collect_static
+import asyncio
+
+# FAST_START=1: statics were collected at build time (python -m utils.assets) and
+# create_all only runs when the database is not already at the Alembic head
+FAST_START = os.getenv("FAST_START", "0") == "1"
+BOOT_BUDGET_MS = float(os.getenv("BOOT_BUDGET_MS", "1500"))
+_boot_phases = {"imports": time.perf_counter() - _boot_started}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await platform_id_allocator.prefetch()
+    # in the background: an unreachable Mongo must not hold up startup for the server selection timeout
+    index_task = asyncio.create_task(ensure_indexes())
+    otp_purge_task = asyncio.create_task(purge_otps_forever())
+    outbox_purge_task = asyncio.create_task(purge_outbox_forever())
+    principal_listener_task = asyncio.create_task(listen_for_principal_invalidations())
+    rollup_task = asyncio.create_task(run_rollup_worker()) if ROLLUP_WORKER else None
+    outbox_task = asyncio.create_task(run_outbox_worker()) if EMAIL_OUTBOX_WORKER else None
+    yield
+    index_task.cancel()
+    otp_purge_task.cancel()
+    outbox_purge_task.cancel()
+    principal_listener_task.cancel()
+    if rollup_task:
+        rollup_task.cancel()
+    if outbox_task:
+        outbox_task.cancel()
+    shutdown_hash_pool()
+    close_smtp_pool()
+    await close_mongo()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request, exc: HashingOverloaded):
+    return JSONResponse(
+        {"detail": exc.detail},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 app.add_middleware(
@@ -30,39 +86,45 @@ app.add_middleware(
 )
 #app.add_middleware(HTTPSRedirectMiddleware)
 
+# Opt-in per-request query count / duplicate detection (SQL_PROFILER=1, header with DEBUG=1)
+if SQL_PROFILER:
+    app.add_middleware(SQLProfilerMiddleware)
+    install_sql_profiler(engine)
+    install_sql_profiler(async_engine.sync_engine)
 
-static_path = Path("static")
-static_path.mkdir(exist_ok=True)
+# Outermost, so it times the whole stack; /metrics aggregates all gunicorn workers
+app.add_middleware(MetricsMiddleware)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
 
-# Path to sqladmin's statics directory
-sqladmin_static_path = os.path.join(os.path.dirname(sqladmin.__file__), "statics")
 
-# Copy files from sqladmin/statics to your static/ dir
-for item in os.listdir(sqladmin_static_path):
-    src = os.path.join(sqladmin_static_path, item)
-    dest = os.path.join(static_path, item)
-    if os.path.isdir(src):
-        shutil.copytree(src, dest, dirs_exist_ok=True)
-    else:
-        shutil.copy2(src, dest)
+_phase_started = time.perf_counter()
+if not FAST_START:
+    collect_static("static")
 
-# Mount your static directory
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount your static directory (also serves the admin's /admin/statics, see below)
+static_files = CachedStaticFiles(directory="static", prebuilt=True)
+app.mount("/static", static_files, name="static")
 
 media_path = Path("media")
 media_path.mkdir(exist_ok=True)
-app.mount("/media", StaticFiles(directory="media"), name="media")
+app.mount("/media", CachedStaticFiles(directory="media"), name="media")
+_boot_phases["static"] = time.perf_counter() - _phase_started
 
-
-Base.metadata.create_all(bind=engine)
+_phase_started = time.perf_counter()
+ensure_schema(fast_start=FAST_START)
+_boot_phases["schema"] = time.perf_counter() - _phase_started
 
 app.include_router(home.router)
 app.include_router(users.router)
+app.include_router(internal.router)
 
 from sqladmin import Admin
 from db.admin import UserAdmin , ProfileAdmin, VerificationOTPAdmin
 
 admin = Admin(app, engine)
+serve_admin_statics(admin, static_files)
 
 # Register admin models
 admin.add_view(UserAdmin)
@@ -70,6 +132,18 @@ admin.add_view(ProfileAdmin)
 admin.add_view(VerificationOTPAdmin)
 
 
+def boot_report():
+    """Print how long this worker took to import main.py, phase by phase"""
+    total_ms = (time.perf_counter() - _boot_started) * 1000
+    phases = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in _boot_phases.items())
+    status = "over budget" if total_ms > BOOT_BUDGET_MS else "ok"
+    print(f"Worker boot {total_ms:.0f}ms ({status}, budget {BOOT_BUDGET_MS:.0f}ms, fast_start={FAST_START}): {phases}")
+    return total_ms
+
+
+boot_report()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, port=8000)
\ No newline at end of file
@@ -10,8 +10,12 @@ Available commands:
 - current: Show current migration version
 - history: Show migration history
 - stamp: Mark database as being at a specific revision
+- backfill: Run a data backfill in resumable chunks
+    python migrate.py backfill list
+    python migrate.py backfill <name> [--batch-size N] [--sleep SECONDS] [--restart]
 """
 
+import argparse
 import subprocess
 import sys
 import os
@@ -30,6 +34,27 @@ def run_command(cmd):
         print(result.stderr, file=sys.stderr)
     return result.returncode
 
+def backfill(argv):
+    """Run a registered data backfill (see db/backfill.py)"""
+    from db.backfill import BACKFILLS, DEFAULT_BATCH_SIZE, DEFAULT_SLEEP, run_backfill
+
+    parser = argparse.ArgumentParser(prog="python migrate.py backfill")
+    parser.add_argument("name", help='Backfill to run, or "list"')
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per chunk/transaction")
+    parser.add_argument("--sleep", type=float, default=DEFAULT_SLEEP, help="Seconds to pause between chunks")
+    parser.add_argument("--restart", action="store_true", help="Ignore recorded progress and start over")
+    args = parser.parse_args(argv)
+
+    if args.name == "list":
+        for name, registered in BACKFILLS.items():
+            print(f"{name}: {registered.description}")
+        return 0
+    if args.name not in BACKFILLS:
+        print(f"Unknown backfill: {args.name} (available: {', '.join(BACKFILLS)})")
+        return 1
+    run_backfill(args.name, batch_size=args.batch_size, sleep=args.sleep, restart=args.restart)
+    return 0
+
 def main():
     if len(sys.argv) < 2:
         print(__doc__)
@@ -61,6 +86,9 @@ def main():
             return 1
         return run_command(f"alembic stamp {sys.argv[2]}")
     
+    elif command == "backfill":
+        return backfill(sys.argv[2:])
+    
     else:
         print(f"Unknown command: {command}")
         print(__doc__)
@@ -0,0 +1,36 @@
+"""Add platform_id sequence
+
+Revision ID: 3c1f9a7d2e64
+Revises: a53a4e4670d9
+Create Date: 2026-10-18 11:02:17.540913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a7d2e64'
+down_revision: Union[str, Sequence[str], None] = 'a53a4e4670d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# One nextval reserves a block of 100 ids (db/platform_ids.py PLATFORM_ID_BLOCK_SIZE);
+# the last block [maxvalue, maxvalue + 100) must still end within 9 * 10**9, the size
+# of the permuted id space.
+platform_id_seq = sa.Sequence('platform_id_seq', start=1, increment=100, maxvalue=8999999900)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite has no sequences; the allocator falls back to random ids there
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.CreateSequence(platform_id_seq))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.DropSequence(platform_id_seq))
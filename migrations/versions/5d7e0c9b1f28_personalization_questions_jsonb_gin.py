@@ -0,0 +1,53 @@
+"""Store personalization_questions as JSONB with a GIN index
+
+The ALTER COLUMN ... TYPE JSONB rewrites the whole profiles table under an
+ACCESS EXCLUSIVE lock: profiles can be neither read nor written until it
+finishes, so run it in a maintenance window on large tables.
+
+Revision ID: 5d7e0c9b1f28
+Revises: 8e2b5d41c7a3
+Create Date: 2026-10-18 12:31:44.902137
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7e0c9b1f28'
+down_revision: Union[str, Sequence[str], None] = '8e2b5d41c7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # JSON and GIN indexes are Postgres features; SQLite keeps its JSON text column
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('profiles', 'personalization_questions',
+               existing_type=sa.JSON(),
+               type_=postgresql.JSONB(),
+               existing_nullable=True,
+               postgresql_using='personalization_questions::jsonb')
+    # The rewrite above has committed once the autocommit block starts; CONCURRENTLY then keeps
+    # profiles writable during the (separate) index build. It cannot run inside a transaction.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_profiles_personalization_questions', 'profiles', ['personalization_questions'],
+                        unique=False, postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_profiles_personalization_questions', table_name='profiles', postgresql_concurrently=True)
+    op.alter_column('profiles', 'personalization_questions',
+               existing_type=postgresql.JSONB(),
+               type_=sa.JSON(),
+               existing_nullable=True,
+               postgresql_using='personalization_questions::json')
@@ -0,0 +1,36 @@
+"""Add backfill_progress table
+
+Revision ID: 8e2b5d41c7a3
+Revises: 3c1f9a7d2e64
+Create Date: 2026-10-18 11:48:05.311562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2b5d41c7a3'
+down_revision: Union[str, Sequence[str], None] = '3c1f9a7d2e64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('backfill_progress',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('last_pk', sa.Integer(), nullable=False),
+    sa.Column('rows_done', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('backfill_progress')
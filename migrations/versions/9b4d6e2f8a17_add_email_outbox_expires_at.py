@@ -0,0 +1,28 @@
+"""Add email_outbox.expires_at
+
+Revision ID: 9b4d6e2f8a17
+Revises: 7f3c2a9e5b10
+Create Date: 2026-10-18 16:42:11.503927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4d6e2f8a17'
+down_revision: Union[str, Sequence[str], None] = '7f3c2a9e5b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('email_outbox', sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('email_outbox', 'expires_at')
@@ -0,0 +1,29 @@
+"""Add verification OTP indexes
+
+Revision ID: a53a4e4670d9
+Revises: 72aeb0bb61e0
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a53a4e4670d9'
+down_revision: Union[str, Sequence[str], None] = '72aeb0bb61e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_verification_otps_email_is_used_created_at', 'verification_otps', ['email', 'is_used', 'created_at'], unique=False)
+    op.create_index('ix_verification_otps_expires_at', 'verification_otps', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_verification_otps_expires_at', table_name='verification_otps')
+    op.drop_index('ix_verification_otps_email_is_used_created_at', table_name='verification_otps')
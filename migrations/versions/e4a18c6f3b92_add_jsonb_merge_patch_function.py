@@ -0,0 +1,58 @@
+"""Add jsonb_merge_patch function
+
+Revision ID: e4a18c6f3b92
+Revises: 5d7e0c9b1f28
+Create Date: 2026-10-18 13:20:09.662481
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a18c6f3b92'
+down_revision: Union[str, Sequence[str], None] = '5d7e0c9b1f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# RFC 7396 JSON merge patch: objects merge recursively, null removes a key,
+# anything else (including arrays) replaces the target value
+JSONB_MERGE_PATCH = """
+CREATE OR REPLACE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+AS $$
+DECLARE
+    item record;
+BEGIN
+    IF patch IS NULL OR jsonb_typeof(patch) <> 'object' THEN
+        RETURN patch;
+    END IF;
+    IF target IS NULL OR jsonb_typeof(target) <> 'object' THEN
+        target := '{}'::jsonb;
+    END IF;
+    FOR item IN SELECT key, value FROM jsonb_each(patch) LOOP
+        IF jsonb_typeof(item.value) = 'null' THEN
+            target := target - item.key;
+        ELSE
+            target := target || jsonb_build_object(item.key, jsonb_merge_patch(target -> item.key, item.value));
+        END IF;
+    END LOOP;
+    RETURN target;
+END;
+$$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postgres only; other databases merge in Python (db/repositories.py)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(JSONB_MERGE_PATCH)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP FUNCTION IF EXISTS jsonb_merge_patch(jsonb, jsonb)")
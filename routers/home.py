@@ -1,29 +1,182 @@
-from fastapi import APIRouter, Depends
-from pymongo import MongoClient
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from bson import ObjectId
+from bson.errors import InvalidId
 from dotenv import load_dotenv
-from db.models import User
-from utils.auth import get_current_user
+from db.mongo import get_orders_collection
+from db.rollups import get_rollups_collection
+from utils.auth import Principal, get_current_user
+from utils.cache import TTLCache
+from utils.responses import dumps
+from schemas.home import DashboardPage, DashboardSummary
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import base64
+import hashlib
 import os
+import re
 
 load_dotenv()
 
 router= APIRouter(prefix="")
 
-mongo_url= os.getenv("MONGO_URL")
-mongo_client = MongoClient(mongo_url)
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "100"))
+DASHBOARD_MAX_PAGE_SIZE = int(os.getenv("DASHBOARD_MAX_PAGE_SIZE", "1000"))
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "15"))
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "256"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
+# Rendered dashboard pages keyed by (platform_id, query); value is (body, etag)
+dashboard_cache = TTLCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL)
+FIELD_NAME_RE = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
 
-@router.get("/dashboard")
-async def user_data_dashboard(current_user: User = Depends(get_current_user)):
+
+def encode_cursor(object_id):
+    """Opaque page token for the last `_id` of a page"""
+    return base64.urlsafe_b64encode(object_id.binary).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        return ObjectId(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def parse_fields(fields):
+    """Turn `?fields=a,b.c` into a Mongo projection (`_id` is always returned)"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    for name in names:
+        if not FIELD_NAME_RE.match(name):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid field name: {name}"
+            )
+    return {name: 1 for name in names}
+
+
+def orders_filter(platform_id, cursor=None, since=None, until=None):
+    """Build the orders query; every condition is served by the (client_id, _id) index"""
+    filter = {"client_id": platform_id}
+    id_range = {}
+    if cursor:
+        id_range["$gt"] = decode_cursor(cursor)
+    # `_id` embeds the creation time, so date ranges become `_id` ranges
+    if since:
+        id_range["$gte"] = ObjectId.from_datetime(since)
+    if until:
+        id_range["$lt"] = ObjectId.from_datetime(until)
+    if id_range:
+        filter["_id"] = id_range
+    return filter
+
+
+async def stream_orders(filter, projection=None):
+    """Yield one JSON document per line as the Mongo cursor produces them"""
+    cursor = get_orders_collection().find(filter=filter, projection=projection).sort("_id", 1).batch_size(DASHBOARD_PAGE_SIZE)
+    async for doc in cursor:
+        yield dumps(doc) + b"\n"
+
+
+async def load_orders_page(filter, projection, limit):
+    """Run the page query and render it once; returns (body, etag)"""
+    # Fetch one extra document to know whether there is a next page
+    result = get_orders_collection().find(filter=filter, projection=projection).sort("_id", 1).limit(limit + 1)
+    data = await result.to_list()
+
+    next_cursor = None
+    if len(data) > limit:
+        data = data[:limit]
+        next_cursor = encode_cursor(data[-1]["_id"])
+
+    # orjson renders ObjectId (utils/responses.py) and datetime directly, no per-document walk
+    body = dumps({"orders": data, "next_cursor": next_cursor})
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return body, etag
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+@router.get("/dashboard", response_model=None, responses={200: {"model": DashboardPage}})
+async def user_data_dashboard(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DASHBOARD_PAGE_SIZE, ge=1, le=DASHBOARD_MAX_PAGE_SIZE),
+    stream: bool = False,
+    fields: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Orders for the current client, oldest first, paginated by `_id`.
+
+    Pass the returned `next_cursor` back as `cursor` to get the next page. With
+    `stream=true` (or `Accept: application/x-ndjson`) every order after `cursor`
+    is streamed as NDJSON instead, without buffering the result set.
+
+    `fields=a,b` limits the returned fields and `since`/`until` restrict orders
+    to a creation-time range (`since` inclusive, `until` exclusive).
+
+    Pages are cached per client for DASHBOARD_CACHE_TTL seconds and carry an
+    ETag; a matching `If-None-Match` gets an empty 304.
+    """
     if not current_user.is_verified:
         return "Verify your account to access the dashboard"
     my_platform_id= str(current_user.platform_id)
-    print(my_platform_id)
-    filter= {"client_id": my_platform_id}
-    result = mongo_client['aiyo']['orders'].find(filter=filter)
-
-    data = list(result)
-    for doc in data:
-        doc["_id"] = str(doc["_id"])  # Convert ObjectId to string for JSON compatibility
-    
-    return {"orders": data}
\ No newline at end of file
+    filter= orders_filter(my_platform_id, cursor, since, until)
+    projection = parse_fields(fields)
+
+    if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(stream_orders(filter, projection), media_type=NDJSON_MEDIA_TYPE)
+
+    cache_key = (my_platform_id, cursor, limit, fields, since, until)
+    body, etag = await dashboard_cache.get_or_load(
+        cache_key, lambda: load_orders_page(filter, projection, limit)
+    )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+
+@router.get("/dashboard/summary", response_model=DashboardSummary)
+async def user_data_dashboard_summary(
+    days: int = Query(30, ge=1, le=366),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Order count and total for the current client, plus per-day buckets for the
+    last `days` days (UTC). One read of the client's rollup document, maintained
+    by `python -m db.rollups worker`; orders appear after ROLLUP_LAG seconds plus
+    the worker's poll interval.
+    """
+    if not current_user.is_verified:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Verify your account to access the dashboard"
+        )
+    my_platform_id= str(current_user.platform_id)
+    rollup = await get_rollups_collection().find_one({"_id": my_platform_id}, projection={"last_id": 0})
+    if not rollup:
+        return {"client_id": my_platform_id, "count": 0, "total": 0, "days": []}
+
+    first_day = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    buckets = sorted((day, bucket) for day, bucket in rollup.get("days", {}).items() if day >= first_day)
+    return {
+        "client_id": my_platform_id,
+        "count": rollup["count"],
+        "total": rollup["total"],
+        "days": [{"date": day, **bucket} for day, bucket in buckets],
+        "updated_at": rollup.get("updated_at"),
+    }
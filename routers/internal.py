@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import engine, async_engine, get_db
+from db.pool import pool_stats
+from db.segments import count_segment, list_segment
+from schemas.internal import PoolStatsResponse, SegmentCount, SegmentPage, SegmentQuery
+from utils.auth import Principal, get_admin_user
+from utils.hashing import hash_pool_stats
+
+router = APIRouter(prefix="/api/internal")
+
+
+@router.get("/pool-stats", response_model=PoolStatsResponse, response_model_exclude_none=True)
+async def get_pool_stats(current_user: Principal = Depends(get_admin_user)):
+    """Connection pool and hashing pool gauges for this worker process"""
+    return {
+        "db": {
+            "async": pool_stats(async_engine.sync_engine),
+            "sync": pool_stats(engine),
+        },
+        "hashing": hash_pool_stats(),
+    }
+
+
+@router.post("/segments/count", response_model=SegmentCount)
+async def segment_count(
+    query: SegmentQuery,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_admin_user),
+):
+    """Number of users whose personalization answers match the query"""
+    return {"count": await count_segment(db, query)}
+
+
+@router.post("/segments/users", response_model=SegmentPage)
+async def segment_users(
+    query: SegmentQuery,
+    cursor: int = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_admin_user),
+):
+    """Matching users ordered by id; pass next_cursor back as `cursor` for the next page"""
+    rows, next_cursor = await list_segment(db, query, after=cursor, limit=limit)
+    return {"users": [row._asdict() for row in rows], "next_cursor": next_cursor}
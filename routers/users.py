@@ -1,17 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from db.models import User, VerificationOTP, Profile, get_db
-from utils.auth import create_session, end_session, get_current_user
-from utils.email_sender import  generate_otp, send_verification_email, send_password_reset_email
-from db.models import pwd_context
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import User, Profile, allocate_platform_id, get_db
+from db.otp_store import get_otp_store
+from db.outbox import enqueue_email, notify_outbox
+from db.repositories import UNCHANGED, get_login_row, get_profile_row, update_profile_row
+from utils.auth import Principal, create_session, end_session, get_current_user, invalidate_principal, principal_cache, principal_cache_usable
+from utils.hashing import hash_password, verify_password
+from utils.email_sender import  generate_otp, render_verification_email, render_password_reset_email
 from datetime import datetime, timedelta
-from sqlalchemy import desc
+from sqlalchemy import select
 from schemas.users import UserCreateModel, UserEmailUpdate, UserPasswordChange, LoginModel, EmailVerificationRequest, ResendVerificationRequest, PasswordResetRequest, PasswordResetVerification, ProfileUpdate
+from schemas.users import DetailResponse, EmailUpdateResponse, LoginResponse, MeResponse, MessageResponse, ProfileUpdateResponse, UserCreatedResponse, VerificationStatusResponse
 router = APIRouter(prefix="/api/auth")
 
-@router.post('/create-user')
-async def create_user(request: Request, data: UserCreateModel, db: Session = Depends(get_db)):
+# platform_id collisions retried by create_user before giving up
+CREATE_USER_ATTEMPTS = 5
+
+@router.post('/create-user', response_model=UserCreatedResponse, status_code=status.HTTP_201_CREATED)
+async def create_user(request: Request, data: UserCreateModel, db: AsyncSession = Depends(get_db)):
     if data.password != data.confirm_password:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -19,7 +27,7 @@ async def create_user(request: Request, data: UserCreateModel, db: Session = Dep
         )
 
 
-    elif db.query(User).filter(User.email == data.email).first():
+    elif (await db.execute(select(User).where(User.email == data.email))).scalars().first():
         return JSONResponse(
             {"detail":"Email already exists"},
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -31,44 +39,61 @@ async def create_user(request: Request, data: UserCreateModel, db: Session = Dep
             status_code=status.HTTP_400_BAD_REQUEST,
         )
     # Your success logic here
-    new_user= User(
-        email= data.email
-    )
-    new_user.set_password(data.password)
-    print(new_user)
-    db.add(new_user)
-    try:
-        db.commit()
-        db.refresh(new_user)
-        # Generate username after user is created and has an ID
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+    password = await hash_password(data.password)
+    # platform_ids handed out before the sequence existed (or by its random fallback)
+    # can collide with a new one: allocate the next id and try again
+    for attempt in range(CREATE_USER_ATTEMPTS):
+        new_user= User(
+            email= data.email,
+            platform_id= await allocate_platform_id(),
+            password= password
+        )
+        print(new_user)
+        db.add(new_user)
+        try:
+            await db.commit()
+            await db.refresh(new_user)
+            break
+        except IntegrityError as e:
+            await db.rollback()
+            if "platform_id" in str(e.orig) and attempt + 1 < CREATE_USER_ATTEMPTS:
+                print(f"platform_id {new_user.platform_id} is taken, allocating another")
+                continue
+            # e.orig only: str(e) would log the INSERT parameters, password hash included
+            print(f"Could not create user {data.email}: {e.orig}")
+            if "email" in str(e.orig):
+                # registered concurrently since the check above
+                raise HTTPException(status_code=400, detail="Email already exists")
+            raise HTTPException(status_code=500, detail="Could not create user")
+        except Exception as e:
+            await db.rollback()
+            print(f"Could not create user {data.email}: {type(e).__name__}")
+            raise HTTPException(status_code=500, detail="Could not create user")
     new_profile= Profile(user_id= new_user.id)
     db.add(new_profile)
     try:
-        db.commit()
-        db.refresh(new_profile)
+        await db.commit()
+        await db.refresh(new_profile)
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+        await db.rollback()
+        print(f"Could not create profile for user {new_user.id}: {e}")
+        raise HTTPException(status_code=500, detail="Could not create user profile")
     
     await send_verification_otp(new_user.email, db)
     create_session(request, new_user)
 
-    return JSONResponse({
+    return {
         'detail': 'User created. Please check your email for verification code.',
         'user': {
             'id': new_user.id,
             'email': new_user.email,
             'is_verified': new_user.is_verified
         }
-    }, status_code=status.HTTP_201_CREATED)
+    }
 
 
 
-async def send_verification_otp(email: str, db: Session):
+async def send_verification_otp(email: str, db: AsyncSession):
     """Generate and send a verification OTP to the user's email"""
     
     # Generate a 6-digit OTP
@@ -77,25 +102,19 @@ async def send_verification_otp(email: str, db: Session):
     # Set expiration time (10 minutes from now)
     expires_at = datetime.now() + timedelta(minutes=10)
     
-    # Create OTP record in database
-    verification_otp = VerificationOTP(
-        email=email,
-        otp=otp,
-        expires_at=expires_at
-    )
-    
-    # Save to database
-    db.add(verification_otp)
+    # Store the OTP and queue its email in one transaction; db/outbox.py delivers it
+    await get_otp_store(db).issue(email, otp, expires_at)
+    enqueue_email(db, email, *render_verification_email(otp), expires_at=expires_at)
     try:
-        db.commit()
-        # Send email with OTP
-        send_verification_email(email, otp)
+        await db.commit()
     except Exception as e:
-        db.rollback()
-        print(f"Error sending verification email: {e}")
+        await db.rollback()
+        print(f"Error queueing verification email: {e}")
+        return
+    notify_outbox()
 
 
-async def send_password_reset_otp(email: str, db: Session):
+async def send_password_reset_otp(email: str, db: AsyncSession):
     """Generate and send a password reset OTP to the user's email"""
     
     # Generate a 6-digit OTP
@@ -104,34 +123,26 @@ async def send_password_reset_otp(email: str, db: Session):
     # Set expiration time (10 minutes from now)
     expires_at = datetime.now() + timedelta(minutes=10)
     
-    # Create OTP record in database
-    verification_otp = VerificationOTP(
-        email=email,
-        otp=otp,
-        expires_at=expires_at
-    )
-    
-    # Save to database
-    db.add(verification_otp)
+    # Store the OTP and queue its email in one transaction; db/outbox.py delivers it
+    await get_otp_store(db).issue(email, otp, expires_at)
+    enqueue_email(db, email, *render_password_reset_email(otp), expires_at=expires_at)
     try:
-        db.commit()
-        # Send password reset email with OTP
-        send_password_reset_email(email, otp)
+        await db.commit()
     except Exception as e:
-        db.rollback()
-        print(f"Error sending password reset email: {e}")
+        await db.rollback()
+        print(f"Error queueing password reset email: {e}")
+        return
+    notify_outbox()
 
 
 
-@router.post('/verify-email')
-async def verify_email(data: EmailVerificationRequest, db: Session = Depends(get_db)):
+@router.post('/verify-email', response_model=MessageResponse)
+async def verify_email(data: EmailVerificationRequest, db: AsyncSession = Depends(get_db)):
     """Verify user's email using the provided OTP"""
     
     # Find the latest OTP for this email that hasn't been used
-    verification = db.query(VerificationOTP).filter(
-        VerificationOTP.email == data.email,
-        VerificationOTP.is_used == False
-    ).order_by(desc(VerificationOTP.created_at)).first()
+    otp_store = get_otp_store(db)
+    verification = await otp_store.latest_unused(data.email)
     
     if not verification:
         raise HTTPException(
@@ -152,39 +163,43 @@ async def verify_email(data: EmailVerificationRequest, db: Session = Depends(get
         )
     
     # Mark OTP as used
-    verification.mark_as_used()
+    await otp_store.mark_used(verification)
 
 
     # Update user's verification status
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.execute(select(User).where(User.email == data.email))).scalars().first()
     if user:
         user.is_verified = True
     
     try:
-        db.commit()
+        await db.commit()
+        if user:
+            await invalidate_principal(user.id)
         return {"message": "Email verified successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     
 
 
 
-@router.delete('/delete-user')
-async def delete_user(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    my_user = db.query(User).filter(User.id == current_user.id).first()
+@router.delete('/delete-user', response_model=DetailResponse)
+async def delete_user(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    my_user = (await db.execute(select(User).where(User.id == current_user.id))).scalars().first()
     if not my_user:
-        return HTTPException(detail="User not found, Unexpected error", status_code=status.HTTP_404_NOT_FOUND)
-    db.delete(my_user)
-    db.commit()
+        raise HTTPException(detail="User not found, Unexpected error", status_code=status.HTTP_404_NOT_FOUND)
+    await db.delete(my_user)
+    await db.commit()
+    await invalidate_principal(my_user.id)
     return JSONResponse({'detail': "User deleted"}, status_code=status.HTTP_204_NO_CONTENT)
 
 
-@router.post("/login")
-async def login(request: Request, data: LoginModel, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
+@router.post("/login", response_model=LoginResponse)
+async def login(request: Request, data: LoginModel, db: AsyncSession = Depends(get_db)):
+    # One statement: user, principal fields and profile nickname (see db/repositories.py)
+    user = await get_login_row(db, data.email)
     
-    if not user or not user.verify_password(data.password):
+    if not user or not await verify_password(data.password, user.password):
         return JSONResponse(
             {'detail': "Invalid email or password is invalid"},
             status_code= status.HTTP_401_UNAUTHORIZED
@@ -192,92 +207,94 @@ async def login(request: Request, data: LoginModel, db: Session = Depends(get_db
     
     # Create session
     create_session(request, user)
+    # The next authenticated request will not need to load the user again
+    if principal_cache_usable():
+        principal_cache.set(user.id, Principal(
+            user.id, user.email, user.platform_id, user.is_verified, user.is_active, user.is_admin, user.joined_at
+        ))
     
-    profile = db.query(Profile).filter(Profile.user_id == user.id).first()
     return {
         "user": {
             "id": user.id,
             "email": user.email
         },
         "profile": {
-            "nickname": profile.nickname
+            "nickname": user.nickname
         },
         "message": "Login successful"
     }
 
-@router.post("/logout")
-async def logout(request: Request, current_user: User = Depends(get_current_user)):
+@router.post("/logout", response_model=MessageResponse)
+async def logout(request: Request, current_user: Principal = Depends(get_current_user)):
     end_session(request)
     return {"message": "Logged out successfully"}
 
 
-@router.patch("/profile/update")
+@router.patch("/profile/update", response_model=ProfileUpdateResponse)
 async def update_profile(
     data: ProfileUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    my_profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
+    # personalization_questions is an RFC 7396 merge patch: keys set to null are removed,
+    # an explicit top-level null clears the whole document
+    questions_patch = data.personalization_questions
+    if questions_patch is None and "personalization_questions" not in data.model_fields_set:
+        questions_patch = UNCHANGED
+
+    try:
+        my_profile = await update_profile_row(db, current_user.id, data.nickname, questions_patch)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
 
     if not my_profile:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
 
-    # Update profile fields if provided in the request
-    if data.nickname is not None:
-        my_profile.nickname = data.nickname
-    
-    if data.personalization_questions is not None:
-        my_profile.personalization_questions = data.personalization_questions
-
-    try:
-        db.commit()
-        db.refresh(my_profile)
-        
-        return {
-            "message": "Profile updated successfully",
-            "profile": {
-                "id": my_profile.id,
-                "nickname": my_profile.nickname,
-                "personalization_questions": my_profile.personalization_questions
-            }
+    return {
+        "message": "Profile updated successfully",
+        "profile": {
+            "id": my_profile.id,
+            "nickname": my_profile.nickname,
+            "personalization_questions": my_profile.personalization_questions
         }
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+    }
 
 
-@router.patch("/profile/update/user-email")
+@router.patch("/profile/update/user-email", response_model=EmailUpdateResponse)
 async def update_user_profile(
     data: UserEmailUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    my_user = db.query(User).filter(User.id == current_user.id).first()
+    my_user = (await db.execute(select(User).where(User.id == current_user.id))).scalars().first()
 
     if not my_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    if db.query(User).filter(User.email == data.email).first():
+    if (await db.execute(select(User).where(User.email == data.email))).scalars().first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
 
     # Update the email
     my_user.email = data.email
 
-    db.commit()
-    db.refresh(my_user)
+    await db.commit()
+    await db.refresh(my_user)
+    await invalidate_principal(my_user.id)
 
     return {"message": "Email updated successfully", "email": my_user.email}
 
 
 
-@router.post('/change-password')
+@router.post('/change-password', response_model=MessageResponse)
 async def change_password(
     data: UserPasswordChange, 
-    current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_db)
 ):
     # Fetch the user instance
-    my_user = db.query(User).filter(User.id == current_user.id).first()
+    my_user = (await db.execute(select(User).where(User.id == current_user.id))).scalars().first()
 
     if not my_user:
         raise HTTPException(
@@ -286,7 +303,7 @@ async def change_password(
         )
     
     # Verify current password
-    if not pwd_context.verify(data.current_password, my_user.password):
+    if not await my_user.averify_password(data.current_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect password"
@@ -300,22 +317,24 @@ async def change_password(
         )
 
     # Hash new password and update user
-    my_user.password = pwd_context.hash(data.new_password)
+    await my_user.aset_password(data.new_password)
     
-    db.commit()
-    db.refresh(my_user)
+    await db.commit()
+    await db.refresh(my_user)
+    await invalidate_principal(my_user.id)
 
     return {"message": "Password changed successfully."}
 
 
-@router.get("/user/me")
+@router.get("/user/me", response_model=MeResponse)
 async def get_profile(
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get the current user's profile with detailed information"""
-    profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
+    # User fields come from the principal; one statement for the profile columns
+    profile = await get_profile_row(db, current_user.id)
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
@@ -327,7 +346,8 @@ async def get_profile(
             "is_verified": current_user.is_verified,
             "is_admin": current_user.is_admin,
             "platform_id": current_user.platform_id,
-            "joined_at": current_user.joined_at
+            "joined_at": current_user.joined_at,
+            "is_active": current_user.is_active
         },
         "profile": {
             "id": profile.id,
@@ -337,12 +357,12 @@ async def get_profile(
         }
 
 
-@router.post('/resend-verification')
-async def resend_verification(data: ResendVerificationRequest, db: Session = Depends(get_db)):
+@router.post('/resend-verification', response_model=MessageResponse)
+async def resend_verification(data: ResendVerificationRequest, db: AsyncSession = Depends(get_db)):
     """Resend verification OTP to an existing user's email"""
     
     # Find the user by email
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.execute(select(User).where(User.email == data.email))).scalars().first()
     
     if not user:
         raise HTTPException(
@@ -363,12 +383,12 @@ async def resend_verification(data: ResendVerificationRequest, db: Session = Dep
 
 
 
-@router.post('/request-password-reset')
-async def request_password_reset(data: PasswordResetRequest, db: Session = Depends(get_db)):
+@router.post('/request-password-reset', response_model=MessageResponse)
+async def request_password_reset(data: PasswordResetRequest, db: AsyncSession = Depends(get_db)):
     """Send password reset OTP to user's email"""
     
     # Find the user by email
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.execute(select(User).where(User.email == data.email))).scalars().first()
     
     if not user:
         # For security reasons, don't reveal if email exists or not
@@ -380,8 +400,8 @@ async def request_password_reset(data: PasswordResetRequest, db: Session = Depen
     return {"message": "If your email is registered with us, you will receive a password reset code shortly."}
 
 
-@router.post('/reset-password')
-async def reset_password(data: PasswordResetVerification, db: Session = Depends(get_db)):
+@router.post('/reset-password', response_model=MessageResponse)
+async def reset_password(data: PasswordResetVerification, db: AsyncSession = Depends(get_db)):
     """Reset user password using OTP verification"""
     
     # Check if passwords match
@@ -399,10 +419,8 @@ async def reset_password(data: PasswordResetVerification, db: Session = Depends(
         )
     
     # Find the latest OTP for this email that hasn't been used
-    verification = db.query(VerificationOTP).filter(
-        VerificationOTP.email == data.email,
-        VerificationOTP.is_used == False
-    ).order_by(desc(VerificationOTP.created_at)).first()
+    otp_store = get_otp_store(db)
+    verification = await otp_store.latest_unused(data.email)
     
     if not verification:
         raise HTTPException(
@@ -423,7 +441,7 @@ async def reset_password(data: PasswordResetVerification, db: Session = Depends(
         )
     
     # Find the user
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.execute(select(User).where(User.email == data.email))).scalars().first()
     
     if not user:
         raise HTTPException(
@@ -432,21 +450,22 @@ async def reset_password(data: PasswordResetVerification, db: Session = Depends(
         )
     
     # Mark OTP as used
-    verification.mark_as_used()
+    await otp_store.mark_used(verification)
     
     # Update user's password
-    user.set_password(data.new_password)
+    await user.aset_password(data.new_password)
     
     try:
-        db.commit()
+        await db.commit()
+        await invalidate_principal(user.id)
         return {"message": "Password reset successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     
 
-@router.get("/verification-status")
-async def check_verification_status(current_user: User = Depends(get_current_user)):
+@router.get("/verification-status", response_model=VerificationStatusResponse)
+async def check_verification_status(current_user: Principal = Depends(get_current_user)):
     """Check if the current user's email is verified"""
     
     return {
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class DashboardPage(BaseModel):
+    """Documents the /dashboard JSON body; the route returns pre-rendered bytes (see load_orders_page)"""
+    orders: List[dict]
+    next_cursor: Optional[str] = None
+
+
+class DaySummary(BaseModel):
+    date: str
+    count: int
+    total: float
+
+
+class DashboardSummary(BaseModel):
+    client_id: str
+    count: int
+    total: float
+    days: List[DaySummary]
+    updated_at: Optional[datetime] = None
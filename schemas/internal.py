@@ -0,0 +1,65 @@
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel, Field
+
+AnswerValue = Union[str, bool, int, float]
+
+
+class SegmentQuery(BaseModel):
+    """
+    Users whose personalization answers match every predicate:
+    - answers: {"question": value} for equality, {"question": [v1, v2]} for "any of"
+    - answered: questions that must have an answer (any value)
+    """
+    answers: Dict[str, Union[AnswerValue, List[AnswerValue]]] = Field(default_factory=dict)
+    answered: List[str] = Field(default_factory=list)
+
+
+class SegmentUser(BaseModel):
+    id: int
+    email: str
+    platform_id: str
+    nickname: Optional[str] = None
+
+
+class SegmentCount(BaseModel):
+    count: int
+
+
+class SegmentPage(BaseModel):
+    users: List[SegmentUser]
+    next_cursor: Optional[int] = None
+
+
+class EnginePoolStats(BaseModel):
+    """db.pool.pool_stats(); the counters are only there for a QueuePool with telemetry"""
+    pool: str
+    size: Optional[int] = None
+    checked_out: Optional[int] = None
+    checked_in: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: Optional[int] = None
+    checkout_timeouts: Optional[int] = None
+    checkout_wait_avg_ms: Optional[float] = None
+    checkout_wait_max_ms: Optional[float] = None
+
+
+class DBPoolStats(BaseModel):
+    # "async" is a keyword, hence the alias
+    async_: EnginePoolStats = Field(alias="async")
+    sync: EnginePoolStats
+
+
+class HashPoolStats(BaseModel):
+    workers: int
+    in_flight: int
+    queue_depth: int
+    max_pending: int
+    completed: int
+    failed: int
+    admission_waiting: int
+    admission_rejected: int
+
+
+class PoolStatsResponse(BaseModel):
+    db: DBPoolStats
+    hashing: HashPoolStats
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field, EmailStr
+from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from datetime import datetime
 
 
@@ -18,21 +19,18 @@ class UserModel(BaseModel):
 
 class UserResponse(BaseModel):  
     id: int
-    email: EmailStr
+    email: str
     joined_at: datetime
     is_active: bool
 
-    class Config:
-        from_attributes = True 
+    model_config = ConfigDict(from_attributes=True)
 
 
 
 class ProfileUpdate(BaseModel):
     nickname: str = None
-    personalization_questions: dict = None
-    
-    class Config:
-        arbitrary_types_allowed = True
+    # RFC 7396 merge patch; null clears the document
+    personalization_questions: Optional[dict] = None
 
 
 
@@ -57,33 +55,30 @@ class EmailVerificationRequest(BaseModel):
     email: str
     otp: str
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "email": "user@example.com",
-                "otp": "123456"
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "email": "user@example.com",
+            "otp": "123456"
         }
+    })
 
 class ResendVerificationRequest(BaseModel):
     email: str
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "email": "user@example.com"
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "email": "user@example.com"
         }
+    })
 
 class PasswordResetRequest(BaseModel):
     email: str
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "email": "user@example.com"
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "email": "user@example.com"
         }
+    })
 
 class PasswordResetVerification(BaseModel):
     email: str
@@ -91,12 +86,80 @@ class PasswordResetVerification(BaseModel):
     new_password: str
     confirm_password: str
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "email": "user@example.com",
-                "otp": "123456",
-                "new_password": "newpassword123",
-                "confirm_password": "newpassword123"
-            }
-        }
\ No newline at end of file
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "email": "user@example.com",
+            "otp": "123456",
+            "new_password": "newpassword123",
+            "confirm_password": "newpassword123"
+        }
+    })
+
+
+# Response models: emails are plain str, stored rows are not re-validated on the way out
+
+class MessageResponse(BaseModel):
+    message: str
+
+
+class DetailResponse(BaseModel):
+    detail: str
+
+
+class CreatedUser(BaseModel):
+    id: int
+    email: str
+    is_verified: bool
+
+
+class UserCreatedResponse(BaseModel):
+    detail: str
+    user: CreatedUser
+
+
+class LoginUser(BaseModel):
+    id: int
+    email: str
+
+
+class LoginProfile(BaseModel):
+    nickname: Optional[str] = None
+
+
+class LoginResponse(BaseModel):
+    user: LoginUser
+    profile: LoginProfile
+    message: str
+
+
+class ProfileResponse(BaseModel):
+    id: int
+    nickname: Optional[str] = None
+    personalization_questions: Optional[dict] = None
+
+
+class ProfileUpdateResponse(BaseModel):
+    message: str
+    profile: ProfileResponse
+
+
+class EmailUpdateResponse(BaseModel):
+    message: str
+    email: str
+
+
+class CurrentUserResponse(UserResponse):
+    is_verified: bool
+    is_admin: bool
+    platform_id: str
+
+
+class MeResponse(BaseModel):
+    user: CurrentUserResponse
+    profile: ProfileResponse
+
+
+class VerificationStatusResponse(BaseModel):
+    is_verified: bool
+    email: str
+    message: str
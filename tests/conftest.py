@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# db.models needs a DATABASE_URL at import time; unit tests run against a throwaway SQLite file
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
@@ -0,0 +1,73 @@
+"""
+merge_patch (Python, non-Postgres databases) and jsonb_merge_patch (SQL, Postgres)
+must apply RFC 7396 merge patches identically.
+
+The SQL cases run when TEST_POSTGRES_URL points at a Postgres database; the
+function is created inside a transaction that is rolled back.
+"""
+
+import json
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from db.models import JSONB_MERGE_PATCH
+from db.repositories import merge_patch
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+CASES = [
+    # null removes a key
+    ({"a": 1, "b": 2}, {"a": None}, {"b": 2}),
+    # removing a missing key is a no-op
+    ({"a": 1}, {"z": None}, {"a": 1}),
+    # nested objects merge
+    ({"a": {"x": 1, "y": 2}, "b": 1}, {"a": {"y": 3, "z": 4}}, {"a": {"x": 1, "y": 3, "z": 4}, "b": 1}),
+    # null removes a nested key
+    ({"a": {"x": 1, "y": 2}}, {"a": {"x": None}}, {"a": {"y": 2}}),
+    # a non-object replaces the value
+    ({"a": {"x": 1}}, {"a": [1, 2]}, {"a": [1, 2]}),
+    ({"a": [1, 2]}, {"a": "text"}, {"a": "text"}),
+    # an object replaces a non-object value
+    ({"a": "text"}, {"a": {"x": 1}}, {"a": {"x": 1}}),
+    # a non-object patch replaces the whole target
+    ({"a": 1}, ["b"], ["b"]),
+    # no target yet
+    (None, {"a": 1, "b": None}, {"a": 1}),
+    ({}, {}, {}),
+]
+
+
+@pytest.mark.parametrize("target, patch, expected", CASES)
+def test_merge_patch(target, patch, expected):
+    assert merge_patch(target, patch) == expected
+
+
+def test_merge_patch_does_not_mutate_target():
+    target = {"a": {"x": 1}}
+    merge_patch(target, {"a": {"x": None}})
+    assert target == {"a": {"x": 1}}
+
+
+@pytest.fixture(scope="module")
+def pg_connection():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(TEST_POSTGRES_URL)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(text(JSONB_MERGE_PATCH))
+        yield connection
+        transaction.rollback()
+    engine.dispose()
+
+
+@pytest.mark.parametrize("target, patch, expected", CASES)
+def test_jsonb_merge_patch(pg_connection, target, patch, expected):
+    result = pg_connection.execute(
+        text("SELECT jsonb_merge_patch(CAST(:target AS jsonb), CAST(:patch AS jsonb))"),
+        {"target": None if target is None else json.dumps(target), "patch": json.dumps(patch)},
+    ).scalar_one()
+    assert result == expected
+    assert result == merge_patch(target, patch)
@@ -0,0 +1,41 @@
+"""Principal cache invalidations received from other workers (Postgres NOTIFY)"""
+
+import pytest
+
+from utils import auth
+
+
+@pytest.fixture(autouse=True)
+def listener_state(monkeypatch):
+    monkeypatch.setitem(auth._listener, "connected", True)
+    auth.principal_cache.clear()
+    yield
+    auth.principal_cache.clear()
+
+
+def principal(user_id):
+    return auth.Principal(user_id, f"user{user_id}@example.com", "1000000000", True, True, False)
+
+
+def test_notification_drops_the_cached_principal():
+    auth.principal_cache.set(1, principal(1))
+    auth.principal_cache.set(2, principal(2))
+    auth._on_principal_invalidated("1")
+    assert auth.principal_cache.get(1) is None
+    assert auth.principal_cache.get(2) is not None
+
+
+def test_malformed_payload_is_ignored():
+    auth.principal_cache.set(1, principal(1))
+    auth._on_principal_invalidated("not-an-id")
+    assert auth.principal_cache.get(1) is not None
+
+
+def test_cache_is_bypassed_while_not_listening():
+    auth._on_listener_disconnected()
+    assert not auth.principal_cache_usable()
+    # notifications may have been missed: a reconnect starts from an empty cache
+    auth.principal_cache.set(1, principal(1))
+    auth._on_listener_connected()
+    assert auth.principal_cache_usable()
+    assert auth.principal_cache.get(1) is None
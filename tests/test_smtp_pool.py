@@ -0,0 +1,47 @@
+"""SMTPConnectionPool against the local SMTP stand-in from bench/smtp_sink.py"""
+
+import pytest
+
+from bench.smtp_sink import SMTPSink
+from utils.email_sender import SMTPConnectionPool
+
+
+@pytest.fixture
+def sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+
+@pytest.fixture
+def pool(sink):
+    pool = SMTPConnectionPool(sink.host, sink.port, username="user", password="secret",
+                              starttls=False, max_size=3, timeout=5)
+    yield pool
+    pool.close()
+
+
+def send(pool):
+    pool.send("from@example.com", ["to@example.com"], "Subject: test\r\n\r\nbody")
+
+
+def test_connections_are_reused(sink, pool):
+    for _ in range(5):
+        send(pool)
+    assert sink.messages == 5
+    assert sink.sessions == 1
+
+
+def test_send_reconnects_after_every_idle_connection_died(sink, pool):
+    warm = [pool._checkout() for _ in range(3)]
+    for conn in warm:
+        pool._checkin(conn)
+    assert sink.sessions == 3
+
+    sink.drop_sessions()
+    send(pool)
+
+    assert sink.messages == 1
+    # the dead idle connections were discarded, only the fresh one is kept
+    assert sink.sessions == 4
+    assert len(pool._idle) == 1
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Bulk import/export of users and their profiles
+Usage: python users_io.py [command] [options]
+
+Available commands:
+- export <file>: Stream every user (with profile) to a CSV or NDJSON file ("-" for stdout)
+- import <file>: Load users from a CSV or NDJSON file, resuming from its checkpoint
+
+Options:
+- --format csv|ndjson: File format (default: from the file extension, else csv)
+- --chunk-size N: Rows per transaction on import / per batch on export (default 10000)
+- --checkpoint PATH: Import checkpoint file (default: <file>.checkpoint)
+- --restart: Ignore an existing checkpoint and import from the first row
+
+Rows carry the stored bcrypt hash and platform_id, so exported users can log
+in unchanged after an import. Users whose email already exists are skipped
+(their profile is left alone); rows whose platform_id is already taken by
+another user are skipped and reported. A missing platform_id is generated. On Postgres rows go through
+COPY (export directly, import via a temporary staging table); other databases
+use keyset-paginated selects and chunked executemany.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from db.models import Profile, User, engine, generate_platform_id
+
+FIELDS = [
+    "email", "password", "platform_id", "is_verified", "is_active", "is_admin",
+    "joined_at", "nickname", "personalization_questions",
+]
+BOOLEAN_FIELDS = ("is_verified", "is_active", "is_admin")
+DEFAULT_CHUNK_SIZE = 10000
+
+EXPORT_COLUMNS = [
+    User.id, User.email, User.password, User.platform_id, User.is_verified, User.is_active,
+    User.is_admin, User.joined_at, Profile.nickname, Profile.personalization_questions,
+]
+
+PG_EXPORT_QUERY = """
+    SELECT u.email, u.password, u.platform_id, u.is_verified, u.is_active, u.is_admin,
+           u.joined_at, p.nickname, p.personalization_questions
+    FROM users u LEFT JOIN profiles p ON p.user_id = u.id
+    ORDER BY u.id
+"""
+
+PG_STAGING_TABLE = """
+    CREATE TEMPORARY TABLE users_import (
+        email varchar(255),
+        password varchar(255),
+        platform_id varchar(10),
+        is_verified boolean,
+        is_active boolean,
+        is_admin boolean,
+        joined_at timestamp,
+        nickname varchar(255),
+        personalization_questions jsonb
+    ) ON COMMIT DROP
+"""
+
+# ON CONFLICT without a target skips rows hitting either unique constraint (email, platform_id).
+# Profiles are only created for the users this statement inserted, never for existing accounts.
+PG_MERGE = """
+    WITH inserted AS (
+        INSERT INTO users (email, password, platform_id, is_verified, is_active, is_admin, joined_at)
+        SELECT email, password, platform_id, is_verified, is_active, is_admin, joined_at
+        FROM users_import
+        ON CONFLICT DO NOTHING
+        RETURNING id, email
+    ), new_profiles AS (
+        INSERT INTO profiles (user_id, nickname, personalization_questions)
+        SELECT i.id, s.nickname, s.personalization_questions
+        FROM inserted i JOIN users_import s ON s.email = i.email
+        ON CONFLICT (user_id) DO NOTHING
+    )
+    SELECT count(*) FROM inserted
+"""
+
+# Rows skipped although their email is new: their platform_id belongs to another user
+PG_PLATFORM_ID_TAKEN = """
+    SELECT s.email FROM users_import s
+    WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.email = s.email)
+"""
+
+
+def is_postgres():
+    return engine.dialect.name == "postgresql"
+
+
+def detect_format(path, requested):
+    if requested:
+        return requested
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def parse_bool(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("t", "true", "1", "yes")
+
+
+def parse_datetime(value):
+    if not value:
+        return datetime.now()
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def parse_questions(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def normalize(record):
+    """File row (CSV strings or NDJSON values) -> insertable values"""
+    if not record.get("email") or not record.get("password"):
+        raise ValueError(f"email and password are required: {record!r}")
+    return {
+        "email": record["email"].strip(),
+        "password": record["password"],
+        "platform_id": record.get("platform_id") or generate_platform_id(),
+        "is_verified": parse_bool(record.get("is_verified"), False),
+        "is_active": parse_bool(record.get("is_active"), True),
+        "is_admin": parse_bool(record.get("is_admin"), False),
+        "joined_at": parse_datetime(record.get("joined_at")),
+        "nickname": record.get("nickname") or None,
+        "personalization_questions": parse_questions(record.get("personalization_questions")),
+    }
+
+
+def read_records(fh, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(fh)
+    else:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---------------------------------------------------------------- export
+
+def export_rows(chunk_size):
+    """Keyset pagination on users.id: every batch is an index range scan"""
+    last_id = 0
+    with engine.connect() as conn:
+        while True:
+            rows = conn.execute(
+                select(*EXPORT_COLUMNS)
+                .outerjoin(Profile, Profile.user_id == User.id)
+                .where(User.id > last_id)
+                .order_by(User.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                return
+            for row in rows:
+                yield row
+            last_id = rows[-1].id
+
+
+def export_users(out, fmt, chunk_size):
+    if is_postgres() and fmt == "csv":
+        raw = engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                cursor.copy_expert(f"COPY ({PG_EXPORT_QUERY}) TO STDOUT WITH (FORMAT csv, HEADER true)", out)
+            return None
+        finally:
+            raw.close()
+
+    writer = csv.writer(out) if fmt == "csv" else None
+    if writer:
+        writer.writerow(FIELDS)
+    count = 0
+    for row in export_rows(chunk_size):
+        record = dict(zip(FIELDS, row[1:]))
+        record["joined_at"] = record["joined_at"].isoformat() if record["joined_at"] else None
+        if writer:
+            questions = record["personalization_questions"]
+            record["personalization_questions"] = json.dumps(questions) if questions is not None else ""
+            writer.writerow(["" if record[field] is None else record[field] for field in FIELDS])
+        else:
+            out.write(json.dumps(record) + "\n")
+        count += 1
+    return count
+
+
+# ---------------------------------------------------------------- import
+
+def import_chunk_postgres(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        questions = row["personalization_questions"]
+        row = {**row, "personalization_questions": json.dumps(questions) if questions is not None else None}
+        writer.writerow(["" if row[field] is None else row[field] for field in FIELDS])
+    buffer.seek(0)
+
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.execute(PG_STAGING_TABLE)
+            cursor.copy_expert(f"COPY users_import ({', '.join(FIELDS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(PG_MERGE)
+            inserted = cursor.fetchone()[0]
+            cursor.execute(PG_PLATFORM_ID_TAKEN)
+            platform_id_taken = [row[0] for row in cursor.fetchall()]
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    return inserted, platform_id_taken
+
+
+def import_chunk_generic(rows):
+    insert = sqlite.insert if engine.dialect.name == "sqlite" else postgresql.insert
+    user_fields = FIELDS[:7]
+    with engine.begin() as conn:
+        # RETURNING only reports the users actually inserted, so existing accounts keep their profile
+        ids = dict(conn.execute(
+            insert(User.__table__).on_conflict_do_nothing().returning(User.email, User.id),
+            [{field: row[field] for field in user_fields} for row in rows],
+        ).all())
+        profiles = [
+            {"user_id": ids[row["email"]], "nickname": row["nickname"],
+             "personalization_questions": row["personalization_questions"]}
+            for row in rows if row["email"] in ids
+        ]
+        if profiles:
+            conn.execute(insert(Profile.__table__).on_conflict_do_nothing(), profiles)
+        skipped = [row["email"] for row in rows if row["email"] not in ids]
+        existing = set(conn.execute(select(User.email).where(User.email.in_(skipped))).scalars()) if skipped else set()
+    platform_id_taken = [email for email in skipped if email not in existing]
+    return len(ids), platform_id_taken
+
+
+def load_checkpoint(path, source):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != os.path.abspath(source):
+        print(f"Checkpoint {path} belongs to {checkpoint.get('source')}, ignoring it")
+        return 0
+    return checkpoint["rows"]
+
+
+def save_checkpoint(path, source, rows):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"source": os.path.abspath(source), "rows": rows, "updated_at": datetime.now().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+
+def import_users(path, fmt, chunk_size, checkpoint_path, restart=False):
+    done = 0 if restart else load_checkpoint(checkpoint_path, path)
+    if done:
+        print(f"Resuming after row {done} (checkpoint {checkpoint_path})")
+    import_chunk = import_chunk_postgres if is_postgres() else import_chunk_generic
+
+    inserted_total = 0
+    platform_id_taken_total = 0
+    started = time.perf_counter()
+    with open(path, newline="") as fh:
+        records = read_records(fh, fmt)
+        for _ in range(done):
+            next(records, None)
+        for chunk in chunked(records, chunk_size):
+            inserted, platform_id_taken = import_chunk([normalize(record) for record in chunk])
+            inserted_total += inserted
+            if platform_id_taken:
+                platform_id_taken_total += len(platform_id_taken)
+                shown = ", ".join(platform_id_taken[:10]) + (", ..." if len(platform_id_taken) > 10 else "")
+                print(f"Skipped {len(platform_id_taken)} rows whose platform_id is already taken: {shown}")
+            done += len(chunk)
+            # The chunk is committed, so a rerun starts after it
+            save_checkpoint(checkpoint_path, path, done)
+            elapsed = time.perf_counter() - started
+            print(f"{done} rows processed, {inserted_total} users inserted ({elapsed:.1f}s)")
+
+    print(f"Import finished: {done} rows, {inserted_total} new users, "
+          f"{platform_id_taken_total} skipped for a taken platform_id")
+    return done, inserted_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export of users and profiles")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("file", help='CSV/NDJSON file ("-" exports to stdout)')
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--checkpoint")
+    parser.add_argument("--restart", action="store_true")
+    args = parser.parse_args()
+
+    fmt = detect_format(args.file, args.format)
+
+    if args.command == "export":
+        if args.file == "-":
+            count = export_users(sys.stdout, fmt, args.chunk_size)
+        else:
+            with open(args.file, "w", newline="") as out:
+                count = export_users(out, fmt, args.chunk_size)
+            print(f"Exported {'all' if count is None else count} users to {args.file}")
+        return 0
+
+    if args.file == "-":
+        print("Import needs a file (checkpoints track rows of a file)")
+        return 1
+    checkpoint_path = args.checkpoint or args.file + ".checkpoint"
+    import_users(args.file, fmt, args.chunk_size, checkpoint_path, restart=args.restart)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
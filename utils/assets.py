@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Build-time asset step: copies sqladmin's statics into ./static, then writes
+precompressed .gz/.br siblings and a manifest of content-hashed URLs that
+utils/static_files.CachedStaticFiles serves with immutable caching.
+
+Usage: python -m utils.assets [static_dir]
+
+Run it once when building the image (see Dockerfile) and start the app with
+FAST_START=1 so workers no longer copy the files on every boot.
+"""
+
+from pathlib import Path
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import sqladmin
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built without it
+    brotli = None
+
+# Already-compressed formats (woff2, images) gain nothing from another pass
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".map", ".json", ".svg", ".html", ".txt", ".ttf", ".eot"}
+MANIFEST_NAME = "manifest.json"
+
+
+def collect_static(static_dir="static"):
+    """Copy files from sqladmin/statics into `static_dir`"""
+    static_path = Path(static_dir)
+    static_path.mkdir(exist_ok=True)
+
+    # Path to sqladmin's statics directory
+    sqladmin_static_path = os.path.join(os.path.dirname(sqladmin.__file__), "statics")
+
+    for item in os.listdir(sqladmin_static_path):
+        src = os.path.join(sqladmin_static_path, item)
+        dest = os.path.join(static_path, item)
+        if os.path.isdir(src):
+            shutil.copytree(src, dest, dirs_exist_ok=True)
+        else:
+            shutil.copy2(src, dest)
+    return static_path
+
+
+def hashed_name(rel_path, digest):
+    """css/main.css -> css/main.<digest>.css"""
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest}{ext}"
+
+
+def build_static(static_dir="static"):
+    """Write .gz/.br variants and the content-hash manifest; returns the manifest"""
+    static_path = Path(static_dir)
+    manifest = {}
+    for path in sorted(static_path.rglob("*")):
+        if not path.is_file() or path.suffix in (".gz", ".br") or path.name == MANIFEST_NAME:
+            continue
+        data = path.read_bytes()
+        rel_path = path.relative_to(static_path).as_posix()
+        manifest[rel_path] = hashed_name(rel_path, hashlib.sha256(data).hexdigest()[:12])
+
+        if path.suffix.lower() not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(gzipped) < len(data):
+            Path(f"{path}.gz").write_bytes(gzipped)
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            if len(compressed) < len(data):
+                Path(f"{path}.br").write_bytes(compressed)
+
+    (static_path / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+def main():
+    static_dir = sys.argv[1] if len(sys.argv) > 1 else "static"
+    collect_static(static_dir)
+    print(f"Collected sqladmin statics into {static_dir}/")
+    manifest = build_static(static_dir)
+    print(f"Built {len(manifest)} hashed assets" + ("" if brotli else " (gzip only, install brotli for .br)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
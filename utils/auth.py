@@ -1,11 +1,97 @@
 from fastapi import Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.models import User, get_db
+from db.notify import NOTIFY_SUPPORTED, listen_forever, pg_notify
+from utils.cache import TTLCache
 from typing import Optional
+import os
 
 SECRET_KEY=  "enter-your-secret-key"
 
-async def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+
+class Principal:
+    """Read-only snapshot of the authenticated user, cheap enough to cache per user_id"""
+    __slots__ = ("id", "email", "platform_id", "is_verified", "is_active", "is_admin", "joined_at")
+
+    def __init__(self, id, email, platform_id, is_verified, is_active, is_admin, joined_at=None):
+        self.id = id
+        self.email = email
+        self.platform_id = platform_id
+        self.is_verified = is_verified
+        self.is_active = is_active
+        self.is_admin = is_admin
+        self.joined_at = joined_at
+
+    @classmethod
+    def from_user(cls, user: User):
+        return cls(
+            user.id,
+            user.email,
+            user.platform_id,
+            user.is_verified,
+            user.is_active,
+            user.is_admin,
+            user.joined_at,
+        )
+
+    def __repr__(self):
+        return self.email
+
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Every worker has its own principal_cache; changes are broadcast over Postgres NOTIFY
+PRINCIPAL_CHANNEL = "principal_invalidated"
+# On Postgres the cache is only used while this worker listens for invalidations,
+# otherwise another worker's change could go unnoticed for up to PRINCIPAL_CACHE_TTL
+_listener = {"connected": not NOTIFY_SUPPORTED}
+
+
+def principal_cache_usable():
+    return _listener["connected"]
+
+
+async def invalidate_principal(user_id):
+    """Drop the cached principal in every worker; call after committing any change to the user's row"""
+    principal_cache.pop(user_id)
+    try:
+        await pg_notify(PRINCIPAL_CHANNEL, user_id)
+    except Exception as e:
+        print(f"Could not broadcast principal invalidation for user {user_id}: {e}")
+
+
+def _on_principal_invalidated(payload):
+    try:
+        principal_cache.pop(int(payload))
+    except ValueError:
+        print(f"Ignoring malformed {PRINCIPAL_CHANNEL} payload: {payload!r}")
+
+
+def _on_listener_connected():
+    # Invalidations sent while this worker was not listening are lost: start over
+    principal_cache.clear()
+    _listener["connected"] = True
+
+
+def _on_listener_disconnected():
+    _listener["connected"] = False
+
+
+async def listen_for_principal_invalidations():
+    """Background task (lifespan): apply other workers' invalidations to this worker's cache"""
+    await listen_forever(
+        PRINCIPAL_CHANNEL,
+        _on_principal_invalidated,
+        on_connected=_on_listener_connected,
+        on_disconnected=_on_listener_disconnected,
+    )
+
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)) -> Optional[Principal]:
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(
@@ -13,13 +99,20 @@ async def get_current_user(request: Request, db: Session = Depends(get_db)) -> O
             detail="Not authenticated"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
-    elif not user.is_active:
+    user = principal_cache.get(user_id) if principal_cache_usable() else None
+    if user is None:
+        result = await db.execute(select(User).where(User.id == user_id))
+        row = result.scalars().first()
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        user = Principal.from_user(row)
+        if principal_cache_usable():
+            principal_cache.set(user_id, user)
+
+    if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User account de-activated"
@@ -33,10 +126,10 @@ def create_session(request: Request, user: User):
 def end_session(request: Request):
     request.session.clear()
 
-def get_admin_user(current_user: User = Depends(get_current_user)):
+def get_admin_user(current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin privileges required"
         )
-    return current_user
\ No newline at end of file
+    return current_user
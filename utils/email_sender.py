@@ -1,11 +1,16 @@
 import os
 import smtplib
+import socket
+import threading
+import time
+from collections import deque
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 import random
 import string
 import argparse
+from utils.metrics import timed
 
 # Load environment variables
 load_dotenv()
@@ -19,10 +24,180 @@ SMTP_PASSWORD = os.getenv("EMAIL_PASSWORD")
 # Use from email address (can be different from username for Gmail)
 SENDER_EMAIL = os.getenv("FROM_EMAIL", SMTP_USERNAME)
 
+# Port 465 uses SSL directly, other ports use STARTTLS
+SMTP_USE_SSL = os.getenv("EMAIL_USE_SSL", "1" if SMTP_PORT == 465 else "0") == "1"
+SMTP_STARTTLS = os.getenv("EMAIL_STARTTLS", "1") == "1"
+SMTP_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", "4"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("EMAIL_POOL_IDLE_TIMEOUT", "60"))
+SMTP_MAX_MESSAGES = int(os.getenv("EMAIL_POOL_MAX_MESSAGES", "100"))
+SMTP_DEBUG = int(os.getenv("EMAIL_DEBUG", "0"))
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "last_used", "sent")
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `max_size` authenticated SMTP sessions open and reuses them across sends.
+
+    Connections idle for longer than `idle_timeout` seconds are closed instead of reused
+    (most servers drop them anyway), and a connection is retired after `max_messages`
+    sends. A send that hits a dropped connection is retried once on a newly opened
+    one; the other idle connections are discarded too, since a server restart or
+    network drop usually kills all of them.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_ssl=False, starttls=True,
+                 max_size=4, idle_timeout=60, max_messages=100, timeout=30, debug=0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.debug = debug
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self):
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls()
+        smtp.set_debuglevel(self.debug)
+        smtp.ehlo()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.smtp.quit()
+        except Exception:
+            try:
+                conn.smtp.close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if now - conn.last_used < self.idle_timeout:
+                    return conn
+                self._close(conn)
+        return self._connect()
+
+    def _checkin(self, conn):
+        conn.last_used = time.monotonic()
+        if conn.sent >= self.max_messages:
+            self._close(conn)
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    def _discard_idle(self):
+        with self._lock:
+            stale = list(self._idle)
+            self._idle.clear()
+        for conn in stale:
+            self._close(conn)
+
+    def send(self, from_addr, to_addrs, msg):
+        """Send one message, reusing a warm connection when one is available"""
+        with self._slots:
+            for attempt in range(2):
+                conn = self._checkout() if attempt == 0 else self._connect()
+                try:
+                    conn.smtp.sendmail(from_addr, to_addrs, msg)
+                # A stale pooled connection is retried once on a fresh one. Every
+                # SMTPException is an OSError too, but protocol errors (refused
+                # recipients, rejected data) are permanent, so they propagate.
+                except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+                    self._close(conn)
+                    if attempt:
+                        raise
+                    self._discard_idle()
+                    continue
+                except Exception:
+                    self._close(conn)
+                    raise
+                conn.sent += 1
+                self._checkin(conn)
+                return
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.pop())
+
+
+_smtp_pool = None
+
+
+def get_smtp_pool():
+    """Return the process-wide SMTP pool built from the EMAIL_* settings"""
+    global _smtp_pool
+    if _smtp_pool is None:
+        _smtp_pool = SMTPConnectionPool(
+            SMTP_SERVER,
+            SMTP_PORT,
+            username=SMTP_USERNAME,
+            password=SMTP_PASSWORD,
+            use_ssl=SMTP_USE_SSL,
+            starttls=SMTP_STARTTLS,
+            max_size=SMTP_POOL_SIZE,
+            idle_timeout=SMTP_IDLE_TIMEOUT,
+            max_messages=SMTP_MAX_MESSAGES,
+            debug=SMTP_DEBUG,
+        )
+    return _smtp_pool
+
+
+def close_smtp_pool():
+    if _smtp_pool is not None:
+        _smtp_pool.close()
+
 def generate_otp(length=6):
     """Generate a random OTP of specified length"""
     return ''.join(random.choices(string.digits, k=length))
 
+def deliver_email(to_email, subject, body):
+    """
+    Send an email over the SMTP pool, raising on failure (used by the outbox worker,
+    which retries; see db/outbox.py)
+    """
+    if not all([SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD]):
+        raise RuntimeError("Email configuration is incomplete")
+
+    # Create message
+    message = MIMEMultipart()
+    message["From"] = SENDER_EMAIL
+    message["To"] = to_email
+    message["Subject"] = subject
+
+    # Add body to email
+    message.attach(MIMEText(body, "html"))
+
+    # Send over a pooled, already authenticated connection
+    with timed("smtp", "send"):
+        get_smtp_pool().send(SENDER_EMAIL, to_email, message.as_string())
+
 def send_email(to_email, subject, body):
     """
     Send an email using SMTP configuration
@@ -35,43 +210,8 @@ def send_email(to_email, subject, body):
     Returns:
         bool: True if email was sent successfully, False otherwise
     """
-    if not all([SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD]):
-        print("Email configuration is incomplete")
-        return False
-    
     try:
-        # Create message
-        message = MIMEMultipart()
-        message["From"] = SENDER_EMAIL
-        message["To"] = to_email
-        message["Subject"] = subject
-        
-        # Add body to email
-        message.attach(MIMEText(body, "html"))
-        
-        # Convert the message to a string
-        msg = message.as_string()
-        
-        # Connect to SMTP server and send email
-        print(f"Connecting to {SMTP_SERVER}:{SMTP_PORT}...")
-        
-        # Port 465 uses SSL directly, port 587 uses STARTTLS
-        if SMTP_PORT == 465:
-            smtp = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
-        else:
-            smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            smtp.starttls()
-        
-        smtp.set_debuglevel(1)  # Enable verbose logging
-        smtp.ehlo()
-        
-        print(f"Logging in as {SMTP_USERNAME}...")
-        smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
-        
-        print(f"Sending email from {SENDER_EMAIL} to {to_email}...")
-        smtp.sendmail(SENDER_EMAIL, to_email, msg)
-        smtp.quit()
-        
+        deliver_email(to_email, subject, body)
         print(f"Email sent successfully to {to_email}")
         return True
         
@@ -80,16 +220,12 @@ def send_email(to_email, subject, body):
         print(f"Error type: {type(e).__name__}")
         return False
 
-def send_verification_email(to_email, otp):
+def render_verification_email(otp):
     """
-    Send a verification email with OTP
+    Build the verification email for an OTP
     
-    Args:
-        to_email: Recipient email address
-        otp: One-time password for verification
-        
     Returns:
-        bool: True if email was sent successfully, False otherwise
+        tuple: (subject, HTML body)
     """
     subject = "Verify Your Email Address"
     body = f"""
@@ -103,19 +239,14 @@ def send_verification_email(to_email, otp):
     </body>
     </html>
     """
-    
-    return send_email(to_email, subject, body)
+    return subject, body
 
-def send_password_reset_email(to_email, otp):
+def render_password_reset_email(otp):
     """
-    Send a password reset email with OTP
+    Build the password reset email for an OTP
     
-    Args:
-        to_email: Recipient email address
-        otp: One-time password for password reset
-        
     Returns:
-        bool: True if email was sent successfully, False otherwise
+        tuple: (subject, HTML body)
     """
     subject = "Reset Your Password"
     body = f"""
@@ -130,8 +261,33 @@ def send_password_reset_email(to_email, otp):
     </body>
     </html>
     """
+    return subject, body
+
+def send_verification_email(to_email, otp):
+    """
+    Send a verification email with OTP
+    
+    Args:
+        to_email: Recipient email address
+        otp: One-time password for verification
+        
+    Returns:
+        bool: True if email was sent successfully, False otherwise
+    """
+    return send_email(to_email, *render_verification_email(otp))
+
+def send_password_reset_email(to_email, otp):
+    """
+    Send a password reset email with OTP
     
-    return send_email(to_email, subject, body)
+    Args:
+        to_email: Recipient email address
+        otp: One-time password for password reset
+        
+    Returns:
+        bool: True if email was sent successfully, False otherwise
+    """
+    return send_email(to_email, *render_password_reset_email(otp))
 
 def main():
     """CLI interface for testing email functionality"""
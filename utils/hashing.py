@@ -0,0 +1,188 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import time
+from contextlib import asynccontextmanager
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+from utils.metrics import HASH_QUEUE_DEPTH, HASH_REJECTED, observe_dependency
+
+load_dotenv()
+
+# Password hashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Every web worker has its own pool, so by default the CPUs are split between them
+# (WEB_CONCURRENCY defaults to 2, as in gunicorn.conf.py)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "2"))
+
+# Number of processes doing bcrypt work. 0 hashes in the calling thread (dev/tests only)
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(max(1, (os.cpu_count() or 1) // max(WEB_CONCURRENCY, 1)))))
+
+# Admission control: hashes allowed to run at once, and callers allowed to wait for a slot
+HASH_MAX_IN_FLIGHT = int(os.getenv("HASH_MAX_IN_FLIGHT", str(max(HASH_POOL_WORKERS, 1) * 2)))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", str(max(HASH_POOL_WORKERS, 1) * 8)))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "2"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+_pool = None
+_stats = {
+    "pending": 0,           # submitted and not finished yet (running + waiting)
+    "max_pending": 0,
+    "completed": 0,
+    "failed": 0,
+}
+
+
+class HashingOverloaded(Exception):
+    """Raised instead of queueing more hashing work; mapped to 429/503 + Retry-After in main.py"""
+
+    def __init__(self, status_code, detail, retry_after=HASH_RETRY_AFTER):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class HashAdmission:
+    """
+    Bounds concurrent hashing to `max_in_flight` with at most `max_queue` waiters.
+
+    A caller arriving at a full queue is rejected immediately (429); a queued caller
+    that does not get a slot within `queue_timeout` seconds is rejected with 503.
+    Either way the request costs no CPU, so cheap endpoints keep their latency.
+    """
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.waiting = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            HASH_REJECTED.labels("429").inc()
+            raise HashingOverloaded(429, "Too many authentication requests, please retry shortly")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            HASH_REJECTED.labels("503").inc()
+            raise HashingOverloaded(503, "Authentication is temporarily overloaded, please retry shortly")
+        finally:
+            self.waiting -= 1
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+hash_admission = HashAdmission(HASH_MAX_IN_FLIGHT, HASH_MAX_QUEUE, HASH_QUEUE_TIMEOUT)
+
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def get_hash_pool():
+    """Return the process pool used for hashing, creating it on first use"""
+    global _pool
+    if _pool is None and HASH_POOL_WORKERS > 0:
+        # forkserver: forking the web worker itself (running event loop, threads,
+        # open connections) can deadlock the children. Preloading this module imports
+        # passlib/bcrypt once in the server instead of in every child. Children still
+        # import the launching script as __mp_main__, which is cheap for gunicorn/uvicorn
+        # but re-runs main.py when the app is started with `python main.py`.
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        _pool = ProcessPoolExecutor(max_workers=HASH_POOL_WORKERS, mp_context=context)
+    return _pool
+
+
+def shutdown_hash_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _replace_broken_pool(broken):
+    # Concurrent callers all see the same broken pool; only the first one shuts it down
+    if _pool is broken:
+        print("Hashing pool is broken (a worker process died), starting a new one")
+        shutdown_hash_pool()
+    return get_hash_pool()
+
+
+async def _run(fn, *args):
+    async with hash_admission.slot():
+        return await _run_in_pool(fn, *args)
+
+
+async def _run_in_pool(fn, *args):
+    pool = get_hash_pool()
+    operation = fn.__name__.lstrip("_")
+    started = time.perf_counter()
+    if pool is None:
+        result = fn(*args)
+        observe_dependency("bcrypt", operation, time.perf_counter() - started)
+        return result
+
+    _stats["pending"] += 1
+    _stats["max_pending"] = max(_stats["max_pending"], _stats["pending"])
+    HASH_QUEUE_DEPTH.inc()
+    loop = asyncio.get_running_loop()
+    try:
+        try:
+            result = await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # a killed child (OOM, segfault) breaks the whole pool for good: retry once on a new one
+            result = await loop.run_in_executor(_replace_broken_pool(pool), fn, *args)
+    except Exception:
+        _stats["failed"] += 1
+        observe_dependency("bcrypt", operation, time.perf_counter() - started, failed=True)
+        raise
+    finally:
+        _stats["pending"] -= 1
+        HASH_QUEUE_DEPTH.dec()
+    _stats["completed"] += 1
+    observe_dependency("bcrypt", operation, time.perf_counter() - started)
+    return result
+
+
+async def hash_password(password):
+    """Hash a password off the event loop"""
+    return await _run(_hash, password)
+
+
+async def verify_password(plain_password, hashed_password):
+    """Verify a password against its hash off the event loop"""
+    return await _run(_verify, plain_password, hashed_password)
+
+
+def hash_pool_stats():
+    """Snapshot of the hashing pool: workers, jobs running and jobs waiting for a worker"""
+    pending = _stats["pending"]
+    return {
+        "workers": HASH_POOL_WORKERS,
+        "in_flight": min(pending, HASH_POOL_WORKERS),
+        "queue_depth": max(0, pending - HASH_POOL_WORKERS),
+        "max_pending": _stats["max_pending"],
+        "completed": _stats["completed"],
+        "failed": _stats["failed"],
+        "admission_waiting": hash_admission.waiting,
+        "admission_rejected": hash_admission.rejected,
+    }
@@ -0,0 +1,193 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import Response
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) so every
+# worker writes its samples there and /metrics aggregates them across workers.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+# Optional bearer token required to scrape /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEPENDENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being handled", multiprocess_mode="livesum"
+)
+DEPENDENCY_LATENCY = Histogram(
+    "dependency_duration_seconds",
+    "Time spent in calls to the database, Mongo, SMTP and bcrypt",
+    ["dependency", "operation"],
+    buckets=DEPENDENCY_BUCKETS,
+)
+DEPENDENCY_ERRORS = Counter(
+    "dependency_errors_total", "Failed dependency calls", ["dependency", "operation"]
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections checked out of the pool", ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond pool_size", ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to check a connection out of the pool", ["engine"],
+    buckets=DEPENDENCY_BUCKETS,
+)
+HASH_QUEUE_DEPTH = Gauge(
+    "hash_pool_pending", "Hashing jobs submitted and not finished", multiprocess_mode="livesum"
+)
+HASH_REJECTED = Counter(
+    "hash_admission_rejected_total", "Hashing requests rejected by admission control", ["status"]
+)
+
+
+def observe_dependency(dependency, operation, seconds, failed=False):
+    DEPENDENCY_LATENCY.labels(dependency, operation).observe(seconds)
+    if failed:
+        DEPENDENCY_ERRORS.labels(dependency, operation).inc()
+
+
+@contextmanager
+def timed(dependency, operation):
+    """Time a block as one call to `dependency`"""
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        observe_dependency(dependency, operation, time.perf_counter() - started, failed)
+
+
+def route_label(scope):
+    """Route template (`/api/auth/user/me`), never the raw path, to keep label cardinality bounded"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    root_path = scope.get("root_path", "")
+    if root_path and root_path != scope.get("app_root_path", ""):
+        return root_path + "/{path}"
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: counts, in-flight and latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = route_label(scope)
+            HTTP_LATENCY.labels(scope["method"], route).observe(elapsed)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+
+
+def instrument_engine(engine, label):
+    """Time every statement and track pool gauges for a (sync) Engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        observe_dependency("db", operation, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        DEPENDENCY_ERRORS.labels("db", "query").inc()
+
+    def _update_pool_gauges(returning=0):
+        pool = engine.pool
+        if hasattr(pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.labels(label).set(pool.checkedout() - returning)
+            DB_POOL_OVERFLOW.labels(label).set(max(0, pool.overflow()))
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        _update_pool_gauges()
+
+    # fires before the connection is handed back, so it still counts as checked out
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        _update_pool_gauges(returning=1)
+
+    telemetry = getattr(engine.pool, "telemetry", None)
+    if telemetry is not None:
+        telemetry.observers.append(DB_POOL_CHECKOUT_WAIT.labels(label).observe)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo command listener feeding dependency_duration_seconds{dependency="mongo"}"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe_dependency("mongo", event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        observe_dependency("mongo", event.command_name, event.duration_micros / 1e6, failed=True)
+
+
+def render_metrics():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+async def metrics_endpoint(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response(status_code=401)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,27 @@
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+
+# Non-str dict keys (ints in personalization answers) are stringified instead of raising
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def bson_default(obj):
+    """orjson fallback for BSON types; datetime, UUID and dataclasses are handled natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj):
+    """Serialize to JSON bytes (orjson + BSON types); Mongo documents need no pre-processing"""
+    return orjson.dumps(obj, default=bson_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """Default response class: FastAPI's orjson response, aware of ObjectId/Decimal128"""
+
+    def render(self, content):
+        return dumps(content)
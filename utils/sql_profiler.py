@@ -0,0 +1,113 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: hooks the engines and profiles every request (meant for staging)
+SQL_PROFILER = os.getenv("SQL_PROFILER", "0") == "1"
+# Debug mode: also report the profile in an X-DB-Profile response header
+SQL_PROFILER_HEADER = os.getenv("DEBUG", "0") == "1"
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+
+_current_profile = ContextVar("sql_profile", default=None)
+
+
+class RequestProfile:
+    """Queries issued while handling one request"""
+    __slots__ = ("queries", "total_time", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.total_time = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, elapsed):
+        self.queries += 1
+        self.total_time += elapsed
+        self.statements[statement] += 1
+
+    def duplicates(self):
+        """Statements run more than once (same SQL text): N+1 loops and redundant re-fetches"""
+        return {statement: count for statement, count in self.statements.items() if count > 1}
+
+    def header_value(self):
+        duplicated = sum(count - 1 for count in self.duplicates().values())
+        return f"queries={self.queries}; time_ms={self.total_time * 1000:.1f}; duplicates={duplicated}"
+
+
+def current_profile():
+    return _current_profile.get()
+
+
+def install_sql_profiler(engine):
+    """Attach the profiler to a (sync) Engine; pass AsyncEngine.sync_engine for async engines"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profiler_query_start"].pop()
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(statement, elapsed)
+        if elapsed * 1000 >= SQL_SLOW_QUERY_MS:
+            logger.warning("Slow query (%.1f ms): %s | params=%r", elapsed * 1000, statement, parameters)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        starts = context.connection.info.get("profiler_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+class SQLProfilerMiddleware:
+    """
+    Pure ASGI middleware collecting a RequestProfile per request.
+
+    Logs a summary for requests that repeat a statement and, in debug mode,
+    adds `X-DB-Profile: queries=N; time_ms=T; duplicates=D` to the response.
+    """
+
+    def __init__(self, app, header=SQL_PROFILER_HEADER):
+        self.app = app
+        self.header = header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if self.header and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-profile", profile.header_value().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            duplicates = profile.duplicates()
+            if duplicates:
+                logger.warning(
+                    "%s %s ran %d queries in %.1f ms with repeated statements: %s",
+                    scope["method"], scope["path"], profile.queries, profile.total_time * 1000,
+                    "; ".join(f"{count}x {statement}" for statement, count in duplicates.items()),
+                )
+            else:
+                logger.debug(
+                    "%s %s ran %d queries in %.1f ms",
+                    scope["method"], scope["path"], profile.queries, profile.total_time * 1000,
+                )
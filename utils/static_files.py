@@ -0,0 +1,212 @@
+import json
+import mimetypes
+import os
+import stat
+import anyio
+import jinja2
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from utils.cache import TTLCache
+
+# Content-Encoding -> suffix of the precompressed sibling file, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+class StaticEntry:
+    __slots__ = ("full_path", "stat_result", "media_type", "etag", "variants", "immutable")
+
+    def __init__(self, full_path, stat_result, media_type, etag, variants, immutable=False):
+        self.full_path = full_path
+        self.stat_result = stat_result
+        self.media_type = media_type
+        self.etag = etag
+        self.variants = variants  # encoding -> (full_path, stat_result)
+        self.immutable = immutable
+
+
+def accepted_encodings(accept_encoding):
+    """Encodings the client accepts (q > 0), lower-cased"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _stat_or_none(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles that answers from an in-memory stat/ETag index.
+
+    - Serves `<file>.br` / `<file>.gz` siblings (built by `python -m utils.assets`)
+      according to `Accept-Encoding`.
+    - URLs listed in `manifest.json` (`name.<hash>.ext`) are served with
+      `Cache-Control: immutable`; plain URLs are revalidated via ETag.
+    - `If-None-Match` is answered with a 304 without touching the filesystem.
+
+    With `prebuilt=True` the whole directory is indexed once at startup (build
+    output never changes at runtime). Otherwise entries are indexed on first use
+    and re-stat'ed every `stat_ttl` seconds, which suits user uploads (/media).
+    """
+
+    def __init__(self, *, directory, prebuilt=False, stat_ttl=10, manifest="manifest.json", **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.prebuilt = prebuilt
+        self.manifest_path = os.path.join(directory, manifest)
+        self.manifest = {}
+        self._index = {}
+        self._lazy_index = TTLCache(maxsize=10000, ttl=stat_ttl)
+        if prebuilt:
+            self.build_index()
+
+    def build_index(self):
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+        index = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith((".br", ".gz")):
+                    continue
+                full_path = os.path.join(root, name)
+                if full_path == self.manifest_path:
+                    continue
+                rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                index[rel_path] = self._make_entry(full_path, os.stat(full_path))
+
+        # name.<hash>.ext -> same file, served as immutable
+        for rel_path, hashed_path in self.manifest.items():
+            entry = index.get(rel_path)
+            if entry is not None:
+                index[hashed_path] = StaticEntry(
+                    entry.full_path, entry.stat_result, entry.media_type, entry.etag, entry.variants, immutable=True
+                )
+        self._index = index
+
+    def url_for(self, path):
+        """Content-hashed path for `path` when the asset build produced one"""
+        return self.manifest.get(path, path)
+
+    @staticmethod
+    def _make_entry(full_path, stat_result):
+        variants = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            variants[encoding] = (full_path + suffix, variant_stat)
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        return StaticEntry(full_path, stat_result, media_type, etag, variants)
+
+    async def _lookup(self, path):
+        rel_path = path.replace(os.sep, "/")
+        if self.prebuilt:
+            return self._index.get(rel_path)
+
+        entry = self._lazy_index.get(rel_path)
+        if entry is not None:
+            # Lazy mounts (/media) change under us: a file replaced or deleted since it was
+            # cached would get a wrong Content-Length or a 500, so re-stat before reusing it
+            current = await anyio.to_thread.run_sync(_stat_or_none, entry.full_path)
+            cached = entry.stat_result
+            if current is not None and (current.st_mtime_ns, current.st_size) == (cached.st_mtime_ns, cached.st_size):
+                return entry
+            self._lazy_index.pop(rel_path)
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+            return None
+        entry = await anyio.to_thread.run_sync(self._make_entry, full_path, stat_result)
+        self._lazy_index.set(rel_path, entry)
+        return entry
+
+    async def get_response(self, path, scope):
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+
+        entry = await self._lookup(path)
+        if entry is None:
+            if self.prebuilt:
+                raise HTTPException(status_code=404)
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        full_path, stat_result, encoding = entry.full_path, entry.stat_result, None
+        if entry.variants:
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for name, _ in ENCODINGS:
+                if name in accepted and name in entry.variants:
+                    encoding = name
+                    full_path, stat_result = entry.variants[name]
+                    break
+
+        # Each encoding is a different representation, so it gets its own strong ETag
+        etag = entry.etag if encoding is None else f'{entry.etag[:-1]}-{encoding}"'
+        headers = {
+            "etag": etag,
+            "cache-control": IMMUTABLE_CACHE_CONTROL if entry.immutable else REVALIDATE_CACHE_CONTROL,
+        }
+        if entry.variants:
+            headers["vary"] = "Accept-Encoding"
+        if encoding is not None:
+            headers["content-encoding"] = encoding
+
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        return FileResponse(
+            full_path,
+            stat_result=stat_result,
+            media_type=entry.media_type,
+            headers=headers,
+        )
+
+
+def serve_admin_statics(admin, static_files):
+    """
+    Serve sqladmin's /admin/statics from `static_files` and make its templates link
+    the content-hashed names, so admin assets get the immutable/precompressed layer.
+
+    `static_files` must hold a copy of sqladmin's statics (utils.assets.collect_static).
+    """
+    for route in admin.admin.routes:
+        if getattr(route, "name", None) == "statics":
+            route.app = static_files
+
+    default_url_for = admin.templates.env.globals["url_for"]
+
+    @jinja2.pass_context
+    def url_for(context, __name, **path_params):
+        if __name == "admin:statics" and "path" in path_params:
+            path_params["path"] = static_files.url_for(path_params["path"])
+        return default_url_for(context, __name, **path_params)
+
+    admin.templates.env.globals["url_for"] = url_for